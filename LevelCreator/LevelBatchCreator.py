@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import time
+from typing import Iterable, Iterator
+
+try:
+    import LevelCreator.LevelCreator as LevelCreator
+    import LevelCreator.LevelUtilities as LU
+except ImportError:
+    import LevelCreator
+    import LevelUtilities as LU
+
+# Generates many puzzles at once using a pool of processes. Each job is the
+# arguments to `LevelCreator.generate`, (size, seed, colors, usable_rules), and
+# may leave off the ones after the size. Since each puzzle only depends on its
+# arguments, the output for a seed is the same as calling `generate` directly.
+
+Job = tuple[int|tuple[int,int], int|None, int, list[int]|None]
+
+class BatchInfo(): # throughput of a call to `generate_many`
+    def __init__(self) -> None:
+        self.workers = 0
+        self.puzzles = 0 # puzzles returned so far.
+        self.elapsed_time = 0.0 # seconds since the pool was started.
+        self.generation_time = 0.0 # seconds spent in `generate` summed over all workers.
+
+    def get_puzzles_per_second(self) -> float:
+        return self.puzzles / self.elapsed_time if self.elapsed_time > 0 else 0.0
+
+    def get_puzzles_per_second_per_worker(self) -> float:
+        return self.get_puzzles_per_second() / self.workers if self.workers > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return "BatchInfo(workers=%i, puzzles=%i, elapsed_time=%.3f, generation_time=%.3f, puzzles_per_second_per_worker=%.3f)" %\
+            (self.workers, self.puzzles, self.elapsed_time, self.generation_time, self.get_puzzles_per_second_per_worker())
+
+def resolve_job(job:tuple) -> Job:
+    '''Fills in the arguments left off of the job, and picks a seed if it has none so the worker and caller agree on it.'''
+    size, seed, colors, usable_rules = tuple(job) + (None, None, 2, None)[len(job):]
+    if seed is None: seed = LU.get_seed()
+    return size, seed, colors, usable_rules
+
+def run_job(indexed_job:tuple[int,Job]) -> tuple[int,tuple[list[int],list[int],dict[str,any]]|None,float]:
+    '''Returns the job's index, the output of `LevelCreator.generate`, and the seconds it took.'''
+    job_index, job = indexed_job
+    start_time = time.perf_counter()
+    output = LevelCreator.generate(*job)
+    return job_index, output, time.perf_counter() - start_time
+
+def generate_many(jobs:Iterable[tuple], workers:int|None=None, chunk_size:int=1, ordered:bool=True, batch_info:BatchInfo|None=None) -> Iterator[tuple[int,tuple[list[int],list[int],dict[str,any]]|None]]:
+    '''Generates a puzzle for each job using `workers` processes (all cores by default), sending jobs to them `chunk_size`
+    at a time. Yields (job index, output of `LevelCreator.generate`) in the order of `jobs` if `ordered` is True, or as
+    they finish otherwise. If `batch_info` is specified, it is updated as puzzles are returned.'''
+    if workers is None: workers = os.cpu_count() or 1
+    if workers < 1: raise ValueError("Invalid worker count %i!" % workers)
+    if batch_info is None: batch_info = BatchInfo()
+    batch_info.workers = workers
+    indexed_jobs = ((job_index, resolve_job(job)) for job_index, job in enumerate(jobs))
+    pool = multiprocessing.Pool(workers) if workers > 1 else None # one worker runs the jobs in this process.
+    start_time = time.perf_counter()
+    try:
+        if pool is None: results = map(run_job, indexed_jobs)
+        elif ordered: results = pool.imap(run_job, indexed_jobs, chunk_size)
+        else: results = pool.imap_unordered(run_job, indexed_jobs, chunk_size)
+        for job_index, output, generation_time in results:
+            batch_info.puzzles += 1
+            batch_info.generation_time += generation_time
+            batch_info.elapsed_time = time.perf_counter() - start_time
+            yield job_index, output
+    finally:
+        if pool is not None: pool.terminate()
+
+if __name__ == "__main__":
+    os.chdir(os.path.split(os.path.split(__file__)[0])[0])
+    batch_info = BatchInfo()
+    for job_index, (full, empty, other_data) in generate_many([(8, seed, 2) for seed in range(32)], batch_info=batch_info):
+        print(job_index, other_data)
+    print(batch_info)
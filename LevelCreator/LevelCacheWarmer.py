@@ -0,0 +1,96 @@
+import argparse
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+import time
+
+import numpy
+
+try:
+    import LevelCreator.LevelGenerator as LevelGenerator
+    import LevelCreator.LevelUtilities as LU
+except ImportError:
+    import LevelGenerator
+    import LevelUtilities as LU
+
+# Builds the cached tables in `_cache` for every board size the game offers, so
+# that no board has to build one the first time it is generated. Run it from the
+# command line with `python -m LevelCreator.LevelCacheWarmer`. The valid rows of
+# each width are split by their first tiles, and the parts are built in separate
+# processes. Rectangular boards are generated with their shorter side as the
+# width, so the widths of the square sizes cover them, too.
+
+PREFIXES_PER_WORKER = 8 # the rows are split into about this many parts per worker.
+
+def get_level_tables() -> list[tuple[int,int]]:
+    '''Returns the (width, colors) of each table that boards of the sizes in `Levels.LEVELS` can use.'''
+    import Utilities.Levels as Levels
+    return [(width, colors) for colors, (minimum, maximum) in Levels.LEVELS.items() for width in range(minimum, maximum + 1, colors)]
+
+def extend_prefixes(job:tuple[int,int,numpy.ndarray]) -> numpy.ndarray:
+    '''Returns the valid rows that start with any of the prefixes, in order.'''
+    width, colors, prefixes = job
+    counts = (prefixes[:, :, None] == numpy.arange(colors, dtype=numpy.int8)).sum(axis=1, dtype=numpy.int8)
+    blocks = list(LU.iterate_valid_lines(width, colors, prefixes, counts))
+    if len(blocks) == 0: return numpy.zeros((0, width), dtype=numpy.int8)
+    return numpy.concatenate(blocks)
+
+def build_valid_rows(width:int, colors:int, pool:multiprocessing.pool.Pool|None, workers:int) -> numpy.ndarray:
+    '''Returns the same rows as `LU.get_valid_lines`, built in parts by the pool's `workers` processes if there is a pool.'''
+    if pool is None: return LU.get_valid_lines(width, colors)
+    wanted_prefixes = workers * PREFIXES_PER_WORKER
+    prefix_length = 1
+    while True:
+        prefixes = numpy.concatenate(list(LU.iterate_valid_lines(width, colors, length=prefix_length)))
+        if len(prefixes) >= wanted_prefixes or prefix_length >= width - 1: break
+        prefix_length += 1
+    jobs = [(width, colors, part) for part in numpy.array_split(prefixes, min(wanted_prefixes, len(prefixes)))]
+    return numpy.concatenate(list(pool.imap(extend_prefixes, jobs)))
+
+def warm(tables:list[tuple[int,int]], workers:int|None=None, force:bool=False) -> dict[tuple[int,int],dict[str,float|bool]]:
+    '''Builds the valid rows and row compatibility of each (width, colors) that is cached, skipping ones already cached
+    unless `force` is True. Prints and returns, for the rows and the compatibility of each, if they were built, and how
+    long that or loading them took and their file sizes.'''
+    if workers is None: workers = os.cpu_count() or 1
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    output:dict[tuple[int,int],dict[str,float|bool]] = {}
+    try:
+        for width, colors in sorted(set(tuple(table) for table in tables), key=lambda table: (table[1], table[0])):
+            if colors ** width < 4096: continue # small tables are built when needed instead of cached.
+            size = (width, width)
+            start_time = time.perf_counter()
+            with LevelGenerator.lock_cache(LevelGenerator.get_cache_path(size, colors)):
+                valid_rows = None if force else LevelGenerator.fetch_cache(size, colors)
+                rows_were_built = valid_rows is None
+                if rows_were_built:
+                    valid_rows = build_valid_rows(width, colors, pool, workers)
+                    LevelGenerator.create_cache(size, colors, valid_rows)
+            rows_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            with LevelGenerator.lock_cache(LevelGenerator.get_compatibility_cache_path(width, colors)):
+                compatibility = None if force else LevelGenerator.fetch_compatibility_cache(width, colors, len(valid_rows))
+                compatibility_was_built = compatibility is None
+                if compatibility_was_built:
+                    LevelGenerator.create_compatibility_cache(width, colors, LevelGenerator.build_row_compatibility(colors, valid_rows))
+            compatibility_time = time.perf_counter() - start_time
+            rows_bytes = os.path.getsize(LevelGenerator.get_cache_path(size, colors))
+            compatibility_bytes = os.path.getsize(LevelGenerator.get_compatibility_cache_path(width, colors))
+            output[width, colors] = {"rows": len(valid_rows), "rows_time": rows_time, "rows_bytes": rows_bytes, "rows_built": rows_were_built,
+                "compatibility_time": compatibility_time, "compatibility_bytes": compatibility_bytes, "compatibility_built": compatibility_was_built}
+            print("%i wide, %i colors: %i rows, %i bytes, %s in %.3f s; compatibility, %i bytes, %s in %.3f s" %\
+                (width, colors, len(valid_rows), rows_bytes, "built" if rows_were_built else "loaded", rows_time,
+                compatibility_bytes, "built" if compatibility_was_built else "loaded", compatibility_time))
+    finally:
+        if pool is not None: pool.terminate()
+    return output
+
+if __name__ == "__main__":
+    os.chdir(os.path.split(os.path.split(os.path.abspath(__file__))[0])[0])
+    if os.getcwd() not in sys.path: sys.path.append(os.getcwd()) # so `Utilities` can be imported when run as a script.
+    parser = argparse.ArgumentParser(description="Builds the cached tables for every board size.")
+    parser.add_argument("--workers", type=int, default=None, help="processes to build with (all cores by default)")
+    parser.add_argument("--force", action="store_true", help="rebuild tables that are already cached")
+    parser.add_argument("--table", type=int, nargs=2, action="append", metavar=("WIDTH", "COLORS"), help="build only this table (may be repeated)")
+    arguments = parser.parse_args()
+    warm(arguments.table if arguments.table is not None else get_level_tables(), arguments.workers, arguments.force)
@@ -1,58 +1,134 @@
 import cProfile
+import math
 import os
 import random
+import time
+from typing import Callable
 
 try:
     import LevelCreator.LevelGenerator as LevelGenerator
     import LevelCreator.LevelSolver as LevelSolver
+    import LevelCreator.LevelSolverBitmask as LevelSolverBitmask
     import LevelCreator.LevelSolverBruteForce as LevelSolverBruteForce
     import LevelCreator.LevelUtilities as LU
     import LevelCreator.LevelValidator as LevelValidator
 except ImportError:
     import LevelGenerator
     import LevelSolver
+    import LevelSolverBitmask
     import LevelSolverBruteForce
     import LevelUtilities as LU
     import LevelValidator
 
-def generate(size:int|tuple[int,int], seed:int|None=None, colors:int=2, usable_rules:list[int]|None=None, gen_info:LU.GenerationInfo|None=None) -> tuple[list[int],list[int],dict[str,any]]|None:
-    '''Returns the solution, the incomplete puzzle, and other data. Will return None if the first item of `break_holder` is True.'''
+def generate(size:int|tuple[int,int], seed:int|None=None, colors:int=2, usable_rules:list[int]|None=None, gen_info:LU.GenerationInfo|None=None, version:int|None=None, time_budget:float|None=None) -> tuple[list[int],list[int],dict[str,any]]|None:
+    '''Returns the solution, the incomplete puzzle, and other data. Will return None if the first item of `break_holder` is True.
+    The global `random` is not used once the seed is known, so it can run in several threads at once. `version` picks the
+    solution generator (see `LevelGenerator.SOLUTION_VERSION`), so old seeds can still make the same boards. If
+    `time_budget` is specified, breakdown stops once that many seconds have passed since it started (the solution is always
+    generated in full), and "budget_hit" in the other data says if it did. A puzzle cut short this way has more tiles than its seed would give without a budget.'''
 
+    if gen_info is None: gen_info = LU.GenerationInfo()
     if seed is None: seed = LU.get_seed()
-    after_seed = LU.get_seed() # seed to start using after this is done to restore the randomness.
-    random.seed(seed)
     if isinstance(size, int): size = (size, size)
     if size[0] % colors != 0: raise ValueError("Invalid width for %s colors!" % colors)
     elif size[1] % colors != 0: raise ValueError("Invalid height for %s colors!" % colors)
     if size[0] > size[1]: solution_generator_size = (size[1], size[0]); is_rotated = True
     else: solution_generator_size = size; is_rotated = False
-    full_grid = LevelGenerator.generate_solution(solution_generator_size, seed, colors, gen_info=gen_info)
+    if version is None: version = LevelGenerator.SOLUTION_VERSION
+    full_grid = LevelGenerator.generate_solution(solution_generator_size, seed, colors, gen_info=gen_info, version=version)
     if full_grid is None: return None
     if is_rotated: full_grid = LU.rotate_board(full_grid, solution_generator_size)
 
-    empty_grid = breakdown(full_grid, size, seed, colors, usable_rules, gen_info=gen_info)
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    empty_grid = breakdown(full_grid, size, seed, colors, usable_rules, gen_info=gen_info, deadline=deadline)
     if empty_grid is None: return None
     quality = round(LU.count_empty_tiles(empty_grid) / (size[0] * size[1]) * 100) # how many empty tiles there are
-    other_data = {"seed": seed, "quality": quality}
-    random.seed(after_seed)
+    other_data = {"seed": seed, "quality": quality, "version": version, "budget_hit": gen_info.budget_hit}
     return full_grid, empty_grid, other_data
 
-def breakdown(tiles:list[int], size:tuple[int,int], seed:int, colors:int=2, usable_rules:list[int]|None=None, gen_info:LU.GenerationInfo|None=None) -> list[int]:
+# REMOVAL ORDERS
+# A removal order picks which tile breakdown tries to remove next. It is given the
+# `BreakdownState` and returns a position in its `remaining` list, which holds the
+# tiles not tried yet in a shuffled order, so returning 0 keeps that order.
+
+class BreakdownState(): # what a removal order can look at
+    def __init__(self, size:tuple[int,int], tiles:list[int], dependencies:LU.DependencyGraph, remaining:list[int], DEFAULT:int) -> None:
+        self.size = size
+        self.tiles = tiles # the puzzle so far.
+        self.dependencies = dependencies
+        self.remaining = remaining
+        self.empty_rows = [0] * size[1] # empty tiles of the puzzle in each row.
+        self.empty_columns = [0] * size[0]
+        for tile_index, tile in enumerate(tiles):
+            if tile == DEFAULT: self.remove(tile_index)
+
+    def remove(self, tile_index:int) -> None:
+        '''Counts a tile removed from the puzzle.'''
+        self.empty_rows[tile_index // self.size[0]] += 1
+        self.empty_columns[tile_index % self.size[0]] += 1
+
+def order_shuffled(state:BreakdownState) -> int:
+    return 0
+
+def order_fewest_dependents(state:BreakdownState) -> int:
+    '''Tries tiles that the fewest deductions were made from first, since removing them throws away the least.'''
+    reverse = state.dependencies.reverse
+    return min(range(len(state.remaining)), key=lambda position: len(reverse[state.remaining[position]]))
+
+def order_most_constrained(state:BreakdownState) -> int:
+    '''Tries tiles whose row and column have the fewest empty tiles first, since they are the easiest to deduce.'''
+    width = state.size[0]
+    empty_rows = state.empty_rows; empty_columns = state.empty_columns
+    return min(range(len(state.remaining)), key=lambda position: empty_rows[state.remaining[position] // width] + empty_columns[state.remaining[position] % width])
+
+def order_checkerboard(state:BreakdownState) -> int:
+    '''Tries the tiles of one color of a checkerboard first, so that removed tiles are spread out.'''
+    width = state.size[0]
+    for position, tile_index in enumerate(state.remaining):
+        if (tile_index // width + tile_index % width) % 2 == 0: return position
+    return 0
+
+REMOVAL_ORDERS:dict[str,Callable[[BreakdownState],int]] = {
+    "shuffled": order_shuffled,
+    "fewest_dependents": order_fewest_dependents,
+    "most_constrained": order_most_constrained,
+    "checkerboard": order_checkerboard,
+}
+REMOVAL_ORDER = order_shuffled # used by breakdown if none is given. Changing it changes the puzzle of every seed.
+
+# GROUP TESTING
+# With `group_testing`, breakdown tries to remove a block of tiles with one solve,
+# and only splits it in half when they cannot all be removed. The block size comes
+# from how often recent tiles could not be removed: about 1 / sqrt(failure rate),
+# or single tiles once that is too high for blocks to save any solves.
+BLOCK_SIZE_MAX = 32
+FAILURE_RATE_WEIGHT = 0.1 # how much each tile tried counts towards the recent failure rate.
+MAX_BLOCK_FAILURE_RATE = 0.3 # tiles are tried one at a time above this failure rate.
+
+def get_block_size(failure_rate:float) -> int:
+    if failure_rate >= MAX_BLOCK_FAILURE_RATE: return 1
+    if failure_rate * BLOCK_SIZE_MAX ** 2 <= 1: return BLOCK_SIZE_MAX
+    return max(1, int(1 / math.sqrt(failure_rate)))
+
+def breakdown(tiles:list[int], size:tuple[int,int], seed:int, colors:int=2, usable_rules:list[int]|None=None, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None, deadline:float|None=None, removal_order:Callable[[BreakdownState],int]|None=None, group_testing:bool=False) -> list[int]:
     '''Removes tiles from the board so it's an actual puzzle.
     basically how this works is that it picks a random tile from the board,
     and then picks an empty tile. That empty tile is picked in order of in
     the row, in the column, and everything else. It attempts to *solve* for
     the value of the empty tile using data available (hence why it
     prioritizes tiles in rows and columns), and then sets the non-empty
-    tile to be empty if it was able to find it.'''
-    tiles = [[tile] for tile in tiles]
+    tile to be empty if it was able to find it. If `rng` is not specified, one seeded with `seed` is used.
+    If `deadline` (a `time.perf_counter` value) passes, it stops and returns the puzzle as it is, which can
+    still be solved since every removal so far was, and sets `budget_hit` of `gen_info`. `removal_order` picks
+    the order tiles are tried in (see `REMOVAL_ORDERS`), and is `REMOVAL_ORDER` by default. If `group_testing` is
+    True, tiles are tried in blocks (see `get_block_size`), which makes a different puzzle in fewer solves.'''
+    tiles = LU.expand_board_bitmask(colors, tiles)
 
-    if seed is None: seed = random.randint(-2147483648, 2147483647)
-    after_seed = random.randint(-2147483648, 2147483647) # seed to start using after this is done to restore the randomness.
-    random.seed(seed)
+    if rng is None:
+        if seed is None: seed = LU.get_seed()
+        rng = random.Random(seed)
     random_range = list(range(size[0] * size[1]))
-    random.shuffle(random_range)
-    tile_index = 0
+    rng.shuffle(random_range)
     since_last_success = 0
     # `index2` causes it to break early if it does not find any tiles
     # within 6 iterations. It is not necessary to breakdown, but it probably
@@ -60,41 +136,82 @@ def breakdown(tiles:list[int], size:tuple[int,int], seed:int, colors:int=2, usab
     # clearly not necessary to the completion of the board exist on larger sizes.
     # If this is removed, the quality stuff may be removed, too. If larger board
     # sizes are created, the value should be raised above 6.
-    dependencies:list[list[int]] = [[] for i in range(size[0] * size[1])] # this is a thing I'm making
+    dependencies = LU.DependencyGraph(size[0] * size[1]) # this is a thing I'm making
      # for optimization. It tracks the tiles a tile is dependent on to be solved.
-    tiles_cache:list[int] = [list(range(1, colors + 1))] * (size[0] * size[1])
-    DEFAULT = list(range(1, colors + 1))
-    for index, tile_index in enumerate(random_range):
-        tile_value = tiles[tile_index]
-        tiles[tile_index] = DEFAULT[:]
-        LU.strip_dependencies(dependencies, tile_index, tiles_cache, colors)
-
-        current_state = LU.copy_tiles(tiles)
-        LU.restore_cache(tiles, tiles_cache, colors) # TODO: if the board is full except for one after this function; assume it's completable (and measure performance)
-        # was_successful = LevelSolverOld.solve(size, tiles, tile_index, dependencies, colors)
-        was_successful = LevelSolver.solve(size, colors, tiles, tile_index, dependencies, usable_rules=usable_rules)
+    DEFAULT = LU.get_default_bitmask(colors)
+    # the puzzle with every deduction from earlier solves that is still valid filled in. Deductions
+    # are kept even when the removal fails, so only the removed tile has to be put back then.
+    solver_tiles = tiles[:]
+    # keeps the solver's counts and lines left to solve between removals, so each solve only
+    # looks at the lines whose tiles changed.
+    solver_context = LevelSolverBitmask.SolverContext(size, colors, solver_tiles)
+    if removal_order is None: removal_order = REMOVAL_ORDER
+    state = BreakdownState(size, tiles, dependencies, random_range[:], DEFAULT)
+
+    def remove_tiles(tile_indexes:list[int]) -> bool:
+        '''Removes the tiles from the puzzle if it can still be solved without them. Returns if it could.'''
+        nonlocal since_last_success
+        tile_values = [tiles[tile_index] for tile_index in tile_indexes]
+        for tile_index in tile_indexes:
+            tiles[tile_index] = DEFAULT
+            LU.strip_dependencies_to_board(dependencies, tile_index, solver_tiles, tiles, solver_context.set_tile)
+
+        # TODO: if the board is full except for one after stripping; assume it's completable (and measure performance)
+        # the other tiles can all be found, so the puzzle can be solved if these can.
+        desired_tile_index = tile_indexes[0] if len(tile_indexes) == 1 else tile_indexes
+        was_successful = LevelSolverBitmask.solve(size, colors, solver_tiles, desired_tile_index, dependencies, usable_rules=usable_rules, gen_info=gen_info, context=solver_context)
         # if not was_successful:
-        #     brute_force_solved = LevelSolverBruteForce.solve(size, colors, current_state)
+        #     brute_force_solved = LevelSolverBruteForce.solve(size, colors, LU.from_bitmask_board(tiles), 2)
         #     if len(brute_force_solved) == 1:
-        #         print("Tile index: %i; true value: %s" % (tile_index, str(tile_value)))
+        #         print("Tile indexes: %s; true values: %s" % (str(tile_indexes), str(tile_values)))
         #         print("Fast solver:")
-        #         LU.print_board(tiles, size)
+        #         LU.print_board(LU.from_bitmask_board(solver_tiles), size)
         #         print("Brute-force solver:")
         #         LU.print_board(brute_force_solved[0], size)
         #         raise RuntimeError("Missing a rule!")
-        tiles_cache = tiles
-        tiles = current_state
         # debug_string += str(int(was_successful))
 
-        if was_successful: tiles[tile_index] = DEFAULT[:]; since_last_success = 0
-        else: tiles[tile_index] = tile_value; since_last_success += 1 # resets the tile's value in case it cannot be extrapolated from current board
+        if was_successful:
+            since_last_success = 0
+            for tile_index in tile_indexes: state.remove(tile_index)
+        else: # resets the tiles' values in case they cannot be extrapolated from current board
+            since_last_success += 1
+            for tile_index, tile_value in zip(tile_indexes, tile_values):
+                tiles[tile_index] = tile_value
+                # tiles partly found are left as they are without group testing, which its seeds depend on.
+                if group_testing or solver_tiles[tile_index] == DEFAULT: solver_context.set_tile(tile_index, tile_value)
+        return was_successful
+
+    def remove_block(tile_indexes:list[int], can_remove_all:bool=True) -> int:
+        '''Removes as many of the tiles as it can, splitting them in half while they cannot all be removed at once. If
+        `can_remove_all` is False, they are already known not to be removable at once. Returns how many it removed.'''
+        if can_remove_all and remove_tiles(tile_indexes): return len(tile_indexes)
+        if len(tile_indexes) == 1: return 0
+        half = len(tile_indexes) // 2
+        first_removed = remove_block(tile_indexes[:half])
+        # if the first half could all be removed, the second half cannot be.
+        return first_removed + remove_block(tile_indexes[half:], first_removed != half)
+
+    tiles_tried = 0
+    failure_rate = 0.0 # for group testing.
+    while len(state.remaining) != 0:
+        if deadline is not None and time.perf_counter() >= deadline:
+            if gen_info is not None: gen_info.budget_hit = True
+            break
+        block_size = get_block_size(failure_rate) if group_testing else 1
+        block = [state.remaining.pop(removal_order(state)) for index in range(min(block_size, len(state.remaining)))]
+        if group_testing:
+            tiles_removed = remove_block(block)
+            kept_weight = (1 - FAILURE_RATE_WEIGHT) ** len(block)
+            failure_rate = failure_rate * kept_weight + (1 - tiles_removed / len(block)) * (1 - kept_weight)
+        else: remove_tiles(block)
         if gen_info is not None:
             if gen_info.breaker: return None
-            gen_info.generation_progress = 0.9 + (index / (len(random_range))) * 0.1
+            gen_info.generation_progress = 0.9 + (tiles_tried / (len(random_range))) * 0.1
+        tiles_tried += len(block)
         # LevelPrinter.print_board(tiles, size)
     # print(debug_string)
-    random.seed(after_seed)
-    tiles = LU.collapse_board(tiles, colors, True)
+    tiles = LU.collapse_board_bitmask(tiles, colors, True)
     if all([color not in tiles for color in range(1, colors + 1)]): # if there are no non-empty tiles
         raise RuntimeError("The board is empty!")
     return tiles
@@ -1,9 +1,18 @@
+import array
 import collections
+import contextlib
+import hashlib
 import math
 import os
 import random
-import re
+import struct
+import threading
+import time
+import zlib
 from math import ceil
+from typing import Iterator
+
+import numpy
 
 try:
     import LevelCreator.LevelUtilities as LU
@@ -20,8 +29,15 @@ def grid_is_valid(size:tuple[int,int], colors:int, y_position:int, max_per_colum
             else: already_columns.append(column)
     return True
 
-def clear_row_from_tiles(size:tuple[int,int], tiles:list[int], valid_rows:collections.deque[list[int]], y:int) -> None:
-    valid_rows.append(tiles[y * size[0]:(y + 1) * size[0]])
+PREVIOUS_STATE_LIMIT = 1 << 16 # fingerprints of queue orders remembered by `generate_solution_legacy`.
+
+def get_queue_fingerprint(row_queue:collections.deque[int]) -> bytes:
+    '''Returns a 16 byte hash of the order of the row indexes in the queue.'''
+    return hashlib.blake2b(array.array("l", row_queue).tobytes(), digest_size=16).digest()
+
+def clear_row_from_tiles(size:tuple[int,int], tiles:list[int], row_queue:collections.deque[int], placed_rows:list[int], y:int) -> None:
+    row_queue.append(placed_rows[y])
+    placed_rows[y] = -1
     tiles[y * size[0]:(y + 1) * size[0]] = [-1] * size[0]
 
 def get_column(size:tuple[int,int], tiles:list[int], x_position:int) -> list[int]:
@@ -34,85 +50,455 @@ def is_invalid_list(colors:int, y_position:int, max_per_column:int, column:list[
         if column.count(color) > max_per_column: return True
     return False
 
-def get_valid_rows(size:tuple[int,int], colors:int, max_per_row:int, regular_expression:re.Pattern[str]) -> list[list[int]]:
-    if colors ** size[0] >= 4096:
+TABLE_CACHE_BUDGET = 256 * 1024 * 1024 # bytes of valid rows and compatibility tables kept in memory.
+table_cache = LU.TableCache(TABLE_CACHE_BUDGET)
+
+def get_valid_row_array(size:tuple[int,int], colors:int) -> numpy.ndarray:
+    '''Returns every valid row of the width of `size` as the rows of a read-only array, in the order of
+    `LU.get_valid_lines`. It is kept in `table_cache`.'''
+    return table_cache.get(("rows", size[0], colors), lambda: create_valid_row_array(size, colors))
+
+def create_valid_row_array(size:tuple[int,int], colors:int) -> numpy.ndarray:
+    if colors ** size[0] < 4096: return LU.get_valid_lines(size[0], colors)
+    cached_data = fetch_cache(size, colors)
+    if cached_data is not None: return cached_data
+    with lock_cache(get_cache_path(size, colors)):
         cached_data = fetch_cache(size, colors)
         if cached_data is not None: return cached_data
-    valid_rows:list[list[int]] = []
-    for index in range(colors ** size[0]):
-        index_string = LU.int_to_string(index, colors).zfill(size[0])
-        if not LU.is_invalid_string(colors, max_per_row, regular_expression, index_string):
-            index_list = [int(i) for i in index_string]
-            valid_rows.append(index_list)
-    if colors ** size[0] >= 4096: create_cache(size, colors, valid_rows)
+        valid_rows = LU.get_valid_lines(size[0], colors)
+        create_cache(size, colors, valid_rows)
     return valid_rows
 
-def create_cache(size:tuple[int,int], colors:int, valid_rows:list[list[int]]) -> None:
-    path_name = "./_cache/solution_%s_%s.bin" % (size[0], colors)
-    if os.path.exists(path_name): return
-    byte_length = ceil((size[0] + 7) / (16 / colors)) # how long each valid row is
-    data_bytes = b"".join([int("".join(LU.int_to_string(tile, colors) for tile in valid_row), colors).to_bytes(byte_length, "big") for valid_row in valid_rows])
-    with open(path_name, "wb") as f:
-        f.write(data_bytes)
+def get_valid_rows(size:tuple[int,int], colors:int) -> list[list[int]]:
+    return get_valid_row_array(size, colors).tolist()
+
+def get_row_compatibility(width:int, colors:int, valid_rows:numpy.ndarray|None=None) -> numpy.ndarray:
+    '''Returns `compatibility[position][color][row]`, which is True if the `row`th row of `get_valid_rows` has `color`
+    (starting at 0) at `position`. Since three in a row depends only on the two rows above, this is all that is needed to
+    find the rows that can go under a pair of rows (see `get_rows_after`). It is loaded lazily and kept in `table_cache`,
+    and is cached in `_cache/compatibility_<width>_<colors>.bin` for the same sizes as the valid rows.'''
+    return table_cache.get(("compatibility", width, colors), lambda: create_row_compatibility(width, colors, valid_rows))
+
+def build_row_compatibility(colors:int, valid_rows:numpy.ndarray) -> numpy.ndarray:
+    '''Returns the row compatibility (see `get_row_compatibility`) of the rows without using the cache.'''
+    return valid_rows.T[:, None, :] == numpy.arange(colors, dtype=numpy.int8)[None, :, None]
+
+def create_row_compatibility(width:int, colors:int, valid_rows:numpy.ndarray|None=None) -> numpy.ndarray:
+    if valid_rows is None: valid_rows = get_valid_row_array((width, width), colors)
+    if colors ** width < 4096: return build_row_compatibility(colors, valid_rows)
+    compatibility = fetch_compatibility_cache(width, colors, len(valid_rows))
+    if compatibility is not None: return compatibility
+    with lock_cache(get_compatibility_cache_path(width, colors)):
+        compatibility = fetch_compatibility_cache(width, colors, len(valid_rows))
+        if compatibility is not None: return compatibility
+        compatibility = build_row_compatibility(colors, valid_rows)
+        create_compatibility_cache(width, colors, compatibility)
+    return compatibility
+
+def get_rows_after(compatibility:numpy.ndarray, above2:list[int], above1:list[int]) -> numpy.ndarray:
+    '''Returns an array that is True for each valid row that can go under the rows `above2` and `above1` without making
+    three in a row in any column.'''
+    positions = [position for position in range(len(above1)) if above1[position] == above2[position]]
+    return ~compatibility[positions, [above1[position] for position in positions]].any(axis=0)
 
-def fetch_cache(size:tuple[int,int], colors:int) -> list[list[int]]|None:
-    path_name = "./_cache/solution_%s_%s.bin" % (size[0], colors)
+def get_compatibility_cache_path(width:int, colors:int) -> str:
+    return "./_cache/compatibility_%s_%s.bin" % (width, colors)
+
+def create_compatibility_cache(width:int, colors:int, compatibility:numpy.ndarray) -> None:
+    '''Writes the table as packed bits followed by their CRC-32.'''
+    data = numpy.packbits(compatibility, axis=2, bitorder="little").tobytes()
+    write_cache_file(get_compatibility_cache_path(width, colors), data + struct.pack("<I", zlib.crc32(data)))
+
+def fetch_compatibility_cache(width:int, colors:int, row_count:int) -> numpy.ndarray|None:
+    '''Returns None if there is no cache, or if it is not the size expected for `row_count` rows or does not match its CRC-32.'''
+    path_name = get_compatibility_cache_path(width, colors)
     if not os.path.exists(path_name): return None
+    data = numpy.fromfile(path_name, dtype=numpy.uint8)
+    data_length = width * colors * ceil(row_count / 8)
+    if len(data) != data_length + 4 or zlib.crc32(data[:data_length]) != struct.unpack("<I", data[data_length:].tobytes())[0]: return None
+    return numpy.unpackbits(data[:data_length].reshape(width, colors, -1), axis=2, count=row_count, bitorder="little").astype(bool)
+
+valid_row_bitsets:dict[tuple[int,int],list[list[int]]] = {}
+
+def get_valid_row_bitsets(width:int, colors:int) -> list[list[int]]:
+    '''Returns `bitsets[position][color]`, an int with bit `i` set if the `i`th row of `get_valid_rows` has
+    `color` (starting at 0) at `position`. Bitsets are kept in memory once created.'''
+    if (width, colors) in valid_row_bitsets: return valid_row_bitsets[width, colors]
+    compatibility = get_row_compatibility(width, colors)
+    valid_row_bitsets[width, colors] = [[int.from_bytes(numpy.packbits(compatibility[position, color], bitorder="little").tobytes(), "little") for color in range(colors)] for position in range(width)]
+    return valid_row_bitsets[width, colors]
+
+# Valid rows are cached in `_cache/solution_<width>_<colors>.bin`. Version 3 files start with
+# `CACHE_HEADER`: the magic bytes, the version, the width, the colors, the bits per tile, the row
+# count, and the CRC-32 of the rows. Each row follows in `ceil(width * bits per tile / 8)` bytes,
+# with the bits of tile `i` at bits `i * bits per tile` and up, least significant first. Version 2
+# files had no CRC-32, and version 1 files had no header and stored each row as a big-endian number
+# in base `colors`. Both are rewritten as version 3 when read. Files are only created while holding
+# a lock file (see `lock_cache`), and are written to a temporary file that then replaces them.
+CACHE_MAGIC = b"0hh1rows"
+CACHE_VERSION = 3
+CACHE_HEADER = struct.Struct("<8sHHHHQI")
+CACHE_HEADER_2 = struct.Struct("<8sHHHHQ")
+CACHE_LOCK_WAIT_TIME = 0.05 # seconds between checks for whether another process has finished creating a cache.
+CACHE_LOCK_TIMEOUT = 600.0 # seconds after which a lock file is assumed to be left by a crash.
+
+def get_cache_path(size:tuple[int,int], colors:int) -> str:
+    return "./_cache/solution_%s_%s.bin" % (size[0], colors)
+
+def remove_stale_lock(lock_path:str) -> None:
+    '''Removes the lock file if it is older than `CACHE_LOCK_TIMEOUT`. It is first renamed to a name only this thread
+    uses, so two waiters never both remove it, and one never removes a lock the other has just taken.'''
+    stale_path = "%s.%i.%i.stale" % (lock_path, os.getpid(), threading.get_ident())
+    try:
+        if time.time() - os.path.getmtime(lock_path) <= CACHE_LOCK_TIMEOUT: return
+        os.rename(lock_path, stale_path)
+    except OSError: return # it was released or taken over in the meantime.
+    if time.time() - os.path.getmtime(stale_path) <= CACHE_LOCK_TIMEOUT: # it was taken again after being checked.
+        try: os.link(stale_path, lock_path) # puts it back unless there is already another lock.
+        except OSError: pass
+    os.remove(stale_path)
+
+@contextlib.contextmanager
+def lock_cache(path_name:str) -> Iterator[None]:
+    '''Holds `<path_name>.lock` while the block runs, first waiting for any other process holding it. The block should
+    check for the cache again, since the process that held the lock may have created it.'''
+    lock_path = path_name + ".lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    while True:
+        try:
+            lock_file = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            remove_stale_lock(lock_path)
+            time.sleep(CACHE_LOCK_WAIT_TIME)
+    try:
+        os.write(lock_file, str(os.getpid()).encode())
+        os.close(lock_file)
+        yield
+    finally:
+        os.remove(lock_path)
+
+def write_cache_file(path_name:str, data:bytes) -> None:
+    '''Writes the file through a temporary file, so a crash never leaves part of it.'''
+    temporary_path = "%s.%i.tmp" % (path_name, os.getpid())
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path_name)
+
+def create_cache(size:tuple[int,int], colors:int, valid_rows:numpy.ndarray) -> None:
+    '''Writes the valid rows to the cache, replacing any file already there.'''
+    width = size[0]
+    bits_per_tile = max(1, (colors - 1).bit_length())
+    tile_bits = (valid_rows[:, :, None] >> numpy.arange(bits_per_tile, dtype=numpy.int8)) & 1 # [row][tile][bit]
+    data = numpy.packbits(tile_bits.reshape(len(valid_rows), width * bits_per_tile).astype(numpy.uint8), axis=1, bitorder="little").tobytes()
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, width, colors, bits_per_tile, len(valid_rows), zlib.crc32(data))
+    write_cache_file(get_cache_path(size, colors), header + data)
+
+def fetch_cache(size:tuple[int,int], colors:int) -> numpy.ndarray|None:
+    '''Returns the cached valid rows, or None if there is no cache, it is for a different size, or it does not match its
+    length or CRC-32. The file is mapped into memory rather than read row by row.'''
+    path_name = get_cache_path(size, colors)
+    if not os.path.exists(path_name): return None
+    with open(path_name, "rb") as f: header = f.read(CACHE_HEADER.size)
+    if not header.startswith(CACHE_MAGIC): return migrate_cache(size, colors)
+    version = struct.unpack_from("<H", header, len(CACHE_MAGIC))[0]
+    if version == 2:
+        magic, version, width, cache_colors, bits_per_tile, row_count = CACHE_HEADER_2.unpack(header[:CACHE_HEADER_2.size])
+        header_size = CACHE_HEADER_2.size
+    elif version == CACHE_VERSION and len(header) == CACHE_HEADER.size:
+        magic, version, width, cache_colors, bits_per_tile, row_count, checksum = CACHE_HEADER.unpack(header)
+        header_size = CACHE_HEADER.size
+    else: return None
+    if width != size[0] or cache_colors != colors: return None
+    row_length = ceil(width * bits_per_tile / 8)
+    if os.path.getsize(path_name) != header_size + row_count * row_length: return None
+    if row_count == 0: data = numpy.zeros((0, row_length), dtype=numpy.uint8)
+    else: data = numpy.memmap(path_name, dtype=numpy.uint8, mode="r", offset=header_size, shape=(row_count, row_length))
+    if version == CACHE_VERSION and zlib.crc32(data) != checksum: return None
+    if bits_per_tile == 8: valid_rows = data.view(numpy.int8)
+    else:
+        tile_bits = numpy.unpackbits(data, axis=1, count=width * bits_per_tile, bitorder="little").reshape(row_count, width, bits_per_tile)
+        valid_rows = (tile_bits << numpy.arange(bits_per_tile, dtype=numpy.uint8)).sum(axis=2, dtype=numpy.int8)
+    if version != CACHE_VERSION:
+        del data # the file can't be replaced while it is mapped on some systems.
+        create_cache(size, colors, valid_rows)
+    return valid_rows
+
+def migrate_cache(size:tuple[int,int], colors:int) -> numpy.ndarray|None:
+    '''Reads a version 1 cache and rewrites it as the current version. Version 1 files have no header, so a file that
+    is not a whole number of rows or does not have every valid row is taken to be corrupt, and None is returned.'''
+    path_name = get_cache_path(size, colors)
     byte_length = ceil((size[0] + 7) / (16 / colors)) # how long each valid row is
-    valid_rows:list[list[int]] = []
-    with open(path_name, "rb") as f:
-        f.seek(0, os.SEEK_END); file_size = f.tell(); f.seek(0, os.SEEK_SET) # get size
-        for i in range(file_size // byte_length):
-            data = f.read(byte_length)
-            valid_rows.append([int(tile, colors) for tile in list(LU.int_to_string(int.from_bytes(data, "big"), colors).zfill(size[0]))])
+    data = numpy.fromfile(path_name, dtype=numpy.uint8)
+    if len(data) % byte_length != 0 or len(data) // byte_length != LU.count_valid_lines(size[0], colors): return None
+    data = data.reshape(-1, byte_length)
+    numbers = numpy.zeros(len(data), dtype=numpy.uint64)
+    for position in range(byte_length): numbers = (numbers << numpy.uint64(8)) | data[:, position]
+    valid_rows = numpy.zeros((len(data), size[0]), dtype=numpy.int8)
+    for position in reversed(range(size[0])):
+        valid_rows[:, position] = numbers % numpy.uint64(colors)
+        numbers //= numpy.uint64(colors)
+    create_cache(size, colors, valid_rows)
     return valid_rows
 
-def generate_solution(size:tuple[int,int], seed:int=None, colors:int=2, gen_info:LU.GenerationInfo|None=None) -> list[int]:
+LEGACY_VERSION = 1 # `generate_solution_legacy`
+BACKTRACKING_VERSION = 2 # `generate_solution_backtracking`
+SOLUTION_VERSION = BACKTRACKING_VERSION # version used if none is given. Each version makes different boards from a seed.
+
+def generate_solution(size:tuple[int,int], seed:int=None, colors:int=2, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None, version:int|None=None) -> list[int]:
+    '''Returns a random complete board using the generator of the given version (`SOLUTION_VERSION` by default). If `rng`
+    is not specified, one seeded with `seed` is used.'''
+    if version is None: version = SOLUTION_VERSION
+    match version:
+        case 1: return generate_solution_legacy(size, seed, colors, gen_info, rng)
+        case 2: return generate_solution_backtracking(size, seed, colors, gen_info, rng)
+        case _: raise ValueError("Invalid solution version %s!" % str(version))
+
+RESTART_BACKTRACKS = 32 # backtracks before `generate_solution_backtracking` first starts over; doubles each time.
+MAX_ROW_TABLE_SIZE = 1 << 19 # widths with more valid rows than this use `generate_solution_sampled` instead.
+ROW_SAMPLE_TRIES = 8 # rows `generate_solution_sampled` draws for a position before removing the row above.
+
+def generate_solution_backtracking(size:tuple[int,int], seed:int=None, colors:int=2, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None) -> list[int]:
+    '''Returns a random complete board by placing rows from the top down in a depth-first search. The counts of each color
+    in each column are kept as rows are placed and removed, so the rows that can go next are found at once from them and
+    the two rows above. Widths with more than `MAX_ROW_TABLE_SIZE` valid rows use `generate_solution_sampled`.'''
+    if rng is None:
+        if seed is None: seed = LU.get_seed()
+        rng = random.Random(seed)
+    if isinstance(size, int): size = (size, size)
+    width, height = size
+    max_per_column = height // colors
+    if LU.get_greatest_valid_size(width, colors) > MAX_ROW_TABLE_SIZE: return generate_solution_sampled(size, seed, colors, gen_info, rng)
+
+    rows = get_valid_row_array(size, colors)
+    order = list(range(len(rows))); rng.shuffle(order)
+    rows = rows[order]
+    code_places = colors ** numpy.arange(width, dtype=numpy.int64)
+    row_codes = rows @ code_places # each row as a number.
+    sorted_codes = numpy.sort(row_codes)
+    column_positions = numpy.arange(width)
+    column_counts = numpy.zeros((width, colors), dtype=numpy.intp) # number of each color in each column so far.
+
+    placed_rows:list[int] = [] # indexes in `rows` of the rows placed so far.
+    used_rows:set[int] = set()
+    candidates:list[numpy.ndarray] = [] # for each placed row, the rows that could have gone there.
+    candidate_positions:list[int] = [] # for each placed row, its position in its candidates.
+    same_color = numpy.eye(colors, dtype=numpy.intp) # [new color][color]
+    def get_placeable(counts:numpy.ndarray, run_lengths:numpy.ndarray, remaining:int) -> tuple[numpy.ndarray,numpy.ndarray]:
+        '''Takes the counts of each color in columns and how many of each color end them, as arrays ending in a color axis,
+        and how many tiles will be left in the columns after the next one. Returns if each color can be placed next without
+        leaving the rest of the column impossible to fill, and the counts after placing each color.'''
+        new_counts = counts[..., None, :] + same_color # [..., new color, color]
+        needed = max_per_column - new_counts
+        others = remaining - needed # tiles left in the column that are not the color.
+        new_run_lengths = (run_lengths[..., :, None] + 1) * same_color
+        # a color can have at most two tiles between each pair of other tiles.
+        placeable = ((needed >= 0) & (needed <= 2 * others + 2 - new_run_lengths)).all(axis=-1) & (new_run_lengths.max(axis=-1) <= 2)
+        return placeable, new_counts
+    def get_candidates() -> numpy.ndarray:
+        '''Returns the indexes of the rows that can be placed next, in order. A row can't be placed if, in any column,
+        the rest of the column could not be filled without too many of a color or three in a row.'''
+        y_position = len(placed_rows)
+        run_lengths = numpy.zeros((width, colors), dtype=numpy.intp) # [column][color] how many of the color end the column.
+        if y_position >= 1:
+            above1 = rows[placed_rows[-1]]
+            run_lengths[column_positions, above1] = 1
+        if y_position >= 2:
+            same_columns = numpy.flatnonzero(above1 == rows[placed_rows[-2]])
+            run_lengths[same_columns, above1[same_columns]] = 2
+        remaining = height - y_position - 1
+        can_place, new_counts = get_placeable(column_counts, run_lengths, remaining) # [column][color]
+        row_indexes = numpy.flatnonzero(can_place[column_positions, rows].all(axis=1))
+        if remaining == 1: # the last row is then known, so it must be a valid, unused row.
+            last_colors = (max_per_column - new_counts).argmax(axis=2) # [column][color]
+            last_codes = last_colors[column_positions, rows[row_indexes]] @ code_places
+            row_indexes = row_indexes[numpy.isin(last_codes, sorted_codes) & ~numpy.isin(last_codes, row_codes[placed_rows]) & (last_codes != row_codes[row_indexes])]
+        return row_indexes
+    def columns_are_unique() -> bool:
+        return len(set(column.tobytes() for column in rows[placed_rows].T)) == width
+
+    total_backtracks = 0
+    backtracks = 0 # since the last restart.
+    restart_backtracks = RESTART_BACKTRACKS
+    next_candidates = get_candidates(); next_position = 0
+    while len(placed_rows) < height:
+        if gen_info is not None and gen_info.breaker: return None
+        if backtracks >= restart_backtracks: # some orders take far longer than others, so it starts over with a new one.
+            order = list(range(len(rows))); rng.shuffle(order)
+            rows = rows[order]; row_codes = row_codes[order]
+            placed_rows.clear(); used_rows.clear(); candidates.clear(); candidate_positions.clear()
+            column_counts[:] = 0
+            backtracks = 0; restart_backtracks *= 2
+            next_candidates = get_candidates(); next_position = 0
+            continue
+        # find the next row at this position that has not been used
+        while next_position < len(next_candidates) and int(next_candidates[next_position]) in used_rows: next_position += 1
+        if next_position >= len(next_candidates): # backtrack
+            if len(placed_rows) == 0: raise RuntimeError("No %ix%i board with %i colors exists!" % (width, height, colors))
+            row_index = placed_rows.pop(); used_rows.discard(row_index)
+            column_counts[column_positions, rows[row_index]] -= 1
+            next_candidates = candidates.pop(); next_position = candidate_positions.pop() + 1
+            total_backtracks += 1; backtracks += 1
+            continue
+        row_index = int(next_candidates[next_position])
+        placed_rows.append(row_index); used_rows.add(row_index)
+        column_counts[column_positions, rows[row_index]] += 1
+        candidates.append(next_candidates); candidate_positions.append(next_position)
+        if len(placed_rows) == height and not columns_are_unique():
+            placed_rows.pop(); used_rows.discard(row_index)
+            column_counts[column_positions, rows[row_index]] -= 1
+            candidates.pop(); next_position = candidate_positions.pop() + 1
+            continue
+        if len(placed_rows) < height: next_candidates = get_candidates(); next_position = 0
+        if gen_info is not None:
+            gen_info.generation_progress = max(gen_info.generation_progress, len(placed_rows) / height * 0.9)
+            gen_info.total_clears = total_backtracks
+    tiles = [int(tile) + 1 for tile in rows[placed_rows].flatten()]
+    return tiles
+
+def generate_solution_sampled(size:tuple[int,int], seed:int=None, colors:int=2, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None) -> list[int]:
+    '''Returns a random complete board by placing rows from the top down, each picked uniformly from the valid rows that
+    leave every column possible to finish (see `LU.LineSampler`), so no table of valid rows is needed. A row is redrawn if
+    it repeats an earlier row, and the row above is removed if none can be found.'''
+    if rng is None:
+        if seed is None: seed = LU.get_seed()
+        rng = random.Random(seed)
+    if isinstance(size, int): size = (size, size)
+    width, height = size
+    max_per_column = height // colors
+
+    column_counts = [[0] * colors for x_position in range(width)] # number of each color in each column so far.
+    placed_rows:list[list[int]] = []
+    def get_allowed_colors() -> list[int]:
+        '''Returns a bitmask for each column of the colors that can go next without leaving the rest of the column
+        impossible to fill.'''
+        y_position = len(placed_rows)
+        remaining = height - y_position - 1
+        allowed:list[int] = []
+        for x_position in range(width):
+            last_color = placed_rows[-1][x_position] if y_position >= 1 else -1
+            run_length = 2 if y_position >= 2 and placed_rows[-2][x_position] == last_color else 1
+            allowed_mask = 0
+            for color in range(colors):
+                if color == last_color and run_length >= 2: continue
+                for other_color in range(colors):
+                    needed = max_per_column - column_counts[x_position][other_color] - (other_color == color)
+                    new_run_length = (run_length + 1 if color == last_color else 1) if other_color == color else 0
+                    # a color can have at most two tiles between each pair of other tiles.
+                    if needed < 0 or needed > 2 * (remaining - needed) + 2 - new_run_length: break
+                else: allowed_mask |= 1 << color
+            allowed.append(allowed_mask)
+        return allowed
+    def place_row(row:list[int], change:int) -> None:
+        for x_position, color in enumerate(row): column_counts[x_position][color] += change
+    def is_acceptable(row:list[int]) -> bool:
+        '''Returns if the row can go next without repeating a row or a column. The row before the last decides the last
+        row, so that must be a valid row, too.'''
+        if row in placed_rows: return False
+        if len(placed_rows) == height - 2:
+            # each column is missing one tile, of the color it has the fewest of.
+            last_row = [min(range(colors), key=lambda color: column_counts[x_position][color] + (row[x_position] == color)) for x_position in range(width)]
+            if last_row == row or last_row in placed_rows or LU.LineSampler(width, colors, [1 << color for color in last_row]).count() == 0: return False
+            rows = placed_rows + [row, last_row]
+        elif len(placed_rows) == height - 1: rows = placed_rows + [row]
+        else: return True
+        return len(set(zip(*rows))) == width # no column repeats.
+
+    total_backtracks = 0
+    backtracks = 0 # since the last restart.
+    restart_backtracks = RESTART_BACKTRACKS
+    while len(placed_rows) < height:
+        if gen_info is not None and gen_info.breaker: return None
+        if backtracks >= restart_backtracks:
+            for row in placed_rows: place_row(row, -1)
+            placed_rows.clear()
+            backtracks = 0; restart_backtracks *= 2
+        sampler = LU.LineSampler(width, colors, get_allowed_colors())
+        row = None
+        for attempt in range(ROW_SAMPLE_TRIES):
+            row = sampler.sample(rng)
+            if row is None or is_acceptable(row): break
+            row = None
+        if row is None: # backtrack
+            if len(placed_rows) == 0: raise RuntimeError("No %ix%i board with %i colors exists!" % (width, height, colors))
+            place_row(placed_rows.pop(), -1)
+            total_backtracks += 1; backtracks += 1
+            continue
+        placed_rows.append(row)
+        place_row(row, 1)
+        if gen_info is not None:
+            gen_info.generation_progress = max(gen_info.generation_progress, len(placed_rows) / height * 0.9)
+            gen_info.total_clears = total_backtracks
+    tiles = [tile + 1 for row in placed_rows for tile in row]
+    return tiles
+
+def generate_solution_legacy(size:tuple[int,int], seed:int=None, colors:int=2, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None) -> list[int]:
+    '''Returns a random complete board by placing rows from a shuffled queue and clearing rows when it gets stuck. If `rng`
+    is not specified, one seeded with `seed` is used.'''
     # wave collapse algorithm I think
-    if seed is None: seed = LU.get_seed()
+    if rng is None:
+        if seed is None: seed = LU.get_seed()
+        rng = random.Random(seed)
     if isinstance(size, int): size = (size, size)
-    after_seed = LU.get_seed() # seed to start using after this is done to restore the randomness.
-    random.seed(seed)
     max_per_row = size[0] // colors
     max_per_column = size[1] // colors
     
-    regular_expression = re.compile("|".join([str(i) + "{3}" for i in range(colors)]))
-    valid_rows = get_valid_rows(size, colors, max_per_row, regular_expression)
-    random.shuffle(valid_rows)
-    valid_rows = collections.deque(valid_rows)
+    valid_row_array = get_valid_row_array(size, colors)
+    compatibility = get_row_compatibility(size[0], colors, valid_row_array)
+    valid_rows = valid_row_array.tolist()
+    row_queue = list(range(len(valid_rows))) # indexes in `valid_rows`, so rows can be looked up in `compatibility`.
+    rng.shuffle(row_queue)
+    row_queue = collections.deque(row_queue)
 
     y_position = 0
     tiles:list[int] = [-1 for i in range(size[0] * size[1])] # output
+    placed_rows:list[int] = [-1] * size[1]
+    rows_after:numpy.ndarray|None = None # the rows that can go under the two rows above `rows_after_position`.
+    rows_after_position = -1
     row_tries:list[int] = [0] * size[1]
-    previous_states:set[str] = set()
+    previous_states:dict[bytes,None] = {} # fingerprints of the queue at each restart, oldest first.
     total_clears = 0
     expected_total_clears = (20 * (10 ** -colors))*math.exp((size[1]/colors)*(2.2 * colors - 2.6))
     while y_position < size[1]:
         # LevelPrinter.print_board([tile + 1 for tile in tiles], size)
         row_tries[y_position] += 1
         
-        current_row = valid_rows.popleft()
-        tiles[y_position * size[0]:(y_position + 1) * size[0]] = current_row
+        current_row = row_queue.popleft()
+        placed_rows[y_position] = current_row
+        if y_position >= 2 and rows_after_position != y_position: # the rows above changed since it was last found.
+            rows_after = get_rows_after(compatibility, valid_rows[placed_rows[y_position - 2]], valid_rows[placed_rows[y_position - 1]])
+            rows_after_position = y_position
+        # rows that make three in a row are skipped before the slower check of the whole grid.
+        if y_position >= 2 and not rows_after[current_row]: is_valid = False
+        else:
+            tiles[y_position * size[0]:(y_position + 1) * size[0]] = valid_rows[current_row]
+            is_valid = grid_is_valid(size, colors, y_position, max_per_column, tiles, y_position == size[1] - 1)
 
-        if grid_is_valid(size, colors, y_position, max_per_column, tiles, y_position == size[1] - 1):
+        if is_valid:
             y_position += 1
         else:
-            clear_row_from_tiles(size, tiles, valid_rows, y_position)
-            if row_tries[y_position] >= len(valid_rows):
-                this_state = tuple([tuple(valid_row) for valid_row in valid_rows])
-                if this_state in previous_states: random.shuffle(valid_rows) # TODO: this could be a potentially slow algorithm for queues. See https://en.wikipedia.org/wiki/Fisher%E2%80%93Yates_shuffle
-                previous_states.add(this_state)
+            clear_row_from_tiles(size, tiles, row_queue, placed_rows, y_position)
+            if row_tries[y_position] >= len(row_queue):
+                # this takes as long as the queue is, but so did the tries since the last restart.
+                this_state = get_queue_fingerprint(row_queue)
+                if this_state in previous_states: # shuffling a list is faster than indexing into the deque.
+                    shuffled_rows = list(row_queue); rng.shuffle(shuffled_rows)
+                    row_queue.clear(); row_queue.extend(shuffled_rows)
+                previous_states[this_state] = None
+                if len(previous_states) > PREVIOUS_STATE_LIMIT: del previous_states[next(iter(previous_states))]
                 row_tries[y_position] = 0
                 for remove_index in range(1, y_position):
-                    clear_row_from_tiles(size, tiles, valid_rows, remove_index)
+                    clear_row_from_tiles(size, tiles, row_queue, placed_rows, remove_index)
                     row_tries[remove_index] = 0
                 y_position = 1
+                rows_after_position = -1
             if gen_info is not None:
                 if gen_info.breaker: return None
                 gen_info.generation_progress = ((-expected_total_clears / (total_clears + expected_total_clears)) + 1.0) * 0.9
                 gen_info.total_clears += 1
             total_clears += 1
-    random.seed(after_seed)
     tiles = [tile + 1 for tile in tiles]
     return tiles
 
@@ -1,9 +1,11 @@
 from typing import Iterator
 
 try:
+    import LevelCreator.LevelSolverBitmask as LevelSolverBitmask
     import LevelCreator.LevelUtilities as LU
     import LevelCreator.LevelValidator as LevelValidator
 except ImportError:
+    import LevelSolverBitmask
     import LevelUtilities as LU
     import LevelValidator
 
@@ -16,7 +18,7 @@ def get_rows_to_solve(size:tuple[int,int], tiles:list[list[int]]) -> list[int]:
     return [row_index for row_index in range(size[1]) if LU.has_incomplete_tiles(values := LU.get_values(LU.get_row_indexes(size, row_index), tiles)) and LU.has_complete_tiles(values)]
 def get_columns_to_solve(size:tuple[int,int], tiles:list[list[int]]) -> list[int]:
     '''Returns the column indexes that contain at least one non-complete tile.'''
-    return [column_index for column_index in range(size[1]) if LU.has_incomplete_tiles(values := LU.get_values(LU.get_column_indexes(size, column_index), tiles)) and LU.has_complete_tiles(values)]
+    return [column_index for column_index in range(size[0]) if LU.has_incomplete_tiles(values := LU.get_values(LU.get_column_indexes(size, column_index), tiles)) and LU.has_complete_tiles(values)]
 
 def add_full_rows(tiles:list[list[int]], size:tuple[int,int], rows_to_solve:list[int], columns_to_solve:list[int], unsolved_rows:set[int], unsolved_columns:set[int]) -> None:
     for row_index in rows_to_solve:
@@ -121,8 +123,10 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
     missing_two_tiles_rows:list[list[list[int]]] = [] # stores values of rows
     missing_two_tiles_rows_y:list[int] = [] # stores y postion of rows
     missing_two_tiles_rows_x:list[list[int]] = [] # stores x positions of tiles
+    missing_two_tiles_rows_lookup:dict[tuple[tuple[int,...],...],int] = {} # first index in missing_two_tiles_rows of each row
     full_rows_y:list[int] = []
     full_rows_values:list[list[list[int]]] = []
+    full_rows_keys:set[tuple[tuple[int,...],...]] = set()
     was_successful = False
     tiles_modified:list[int] = []
     # FIND ROWS
@@ -139,11 +143,14 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
                         if color1 == color2: continue
                         new_row = row_values[:]
                         new_row[tile1] = [color1]; new_row[tile2] = [color2]
+                        missing_two_tiles_rows_lookup.setdefault(tuple(map(tuple, new_row)), len(missing_two_tiles_rows))
                         missing_two_tiles_rows.append(new_row)
                         missing_two_tiles_rows_y.append(row_y)
                         missing_two_tiles_rows_x.append(unknown_tiles)
             case 0:
-                if row_values in full_rows_values: continue # if the row is already existing
+                row_key = tuple(map(tuple, row_values))
+                if row_key in full_rows_keys: continue # if the row is already existing
+                full_rows_keys.add(row_key)
                 full_rows_values.append(row_values)
                 full_rows_y.append(row_y)
     # SOLVE ROWS
@@ -151,8 +158,8 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
         full_row_indexes = LU.get_row_indexes(size, full_row_y)
         # row_values = get_values(full_row_indexes, tiles)
         row_values = full_rows_values[index]
-        if row_values not in missing_two_tiles_rows: continue
-        empty_row_index = missing_two_tiles_rows.index(row_values) # finds which empty row it can duplicate.
+        empty_row_index = missing_two_tiles_rows_lookup.get(tuple(map(tuple, row_values))) # finds which empty row it can duplicate.
+        if empty_row_index is None: continue
         y = missing_two_tiles_rows_y[empty_row_index]
         x1, x2 = missing_two_tiles_rows_x[empty_row_index]
         tile1_not = tiles[x1 + full_row_y * size[0]][0]
@@ -169,8 +176,10 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
     missing_two_tiles_columns:list[list[list[int]]] = [] # stores values of columns
     missing_two_tiles_columns_x:list[int] = [] # stores x postion of columns
     missing_two_tiles_columns_y:list[list[int]] = [] # stores y positions of tiles
+    missing_two_tiles_columns_lookup:dict[tuple[tuple[int,...],...],int] = {} # first index in missing_two_tiles_columns of each column
     full_columns_x:list[int] = []
     full_columns_values:list[list[list[int]]] = []
+    full_columns_keys:set[tuple[tuple[int,...],...]] = set()
     for column_x in range(size[0]):
         column_indexes = LU.get_column_indexes(size, column_x)
         unknown_tiles = LU.get_incomplete_tile_indexes_within(column_indexes, tiles) # index within column of unknown tiles
@@ -184,11 +193,14 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
                         if color1 == color2: continue
                         new_column = column_values[:]
                         new_column[tile1] = [color1]; new_column[tile2] = [color2]
+                        missing_two_tiles_columns_lookup.setdefault(tuple(map(tuple, new_column)), len(missing_two_tiles_columns))
                         missing_two_tiles_columns.append(new_column)
                         missing_two_tiles_columns_x.append(column_x)
                         missing_two_tiles_columns_y.append(unknown_tiles)
             case 0:
-                if column_values in full_columns_values: continue
+                column_key = tuple(map(tuple, column_values))
+                if column_key in full_columns_keys: continue
+                full_columns_keys.add(column_key)
                 full_columns_values.append(column_values)
                 full_columns_x.append(column_x)
     # SOLVE COLUMNS
@@ -196,8 +208,8 @@ def solve_cloning(size:tuple[int,int], tiles:list[list[int]], dependencies:list[
         full_column_indexes = LU.get_column_indexes(size, full_column_x)
         # column_values = get_values(full_column_indexes, tiles)
         column_values = full_columns_values[index]
-        if column_values not in missing_two_tiles_columns: continue
-        empty_column_index = missing_two_tiles_columns.index(column_values) # finds which empty column it can duplicate.
+        empty_column_index = missing_two_tiles_columns_lookup.get(tuple(map(tuple, column_values))) # finds which empty column it can duplicate.
+        if empty_column_index is None: continue
         y1, y2 = missing_two_tiles_columns_y[empty_column_index]
         x = missing_two_tiles_columns_x[empty_column_index]
         tile1_not = tiles[full_column_x + y1 * size[0]][0] # the value that the first unknown tile can't be
@@ -310,8 +322,24 @@ def solve_rule_4(size:int, colors:int, indexes:list[int], tiles:list[list[int]],
             if dependencies is not None: dependencies[tile_index] = full_tile_indexes[:]
     return len(tiles_modified) > 0, tiles_modified
 
+def solve_line(colors:int, indexes:list[int], tiles:list[list[int]], dependencies:list[list[int]]|None) -> tuple[bool,list[int]]:
+    '''Narrows each tile of a row or column to the colors it has in the valid lines that fit the rest of it. See `LevelSolverBitmask.solve_line`.'''
+    line = tuple(LU.tile_to_bitmask(tiles[tile_index]) for tile_index in indexes)
+    possibilities = LevelSolverBitmask.get_line_possibilities(colors, line)
+    if possibilities == line: return False, []
+    DEFAULT = list(range(1, colors + 1))
+    dependency = [tile_index for tile_index in indexes if tiles[tile_index] != DEFAULT]
+    tiles_modified:list[int] = []
+    for position, tile_index in enumerate(indexes):
+        if possibilities[position] == line[position]: continue
+        tiles[tile_index] = LU.bitmask_to_tile(possibilities[position])
+        tiles_modified.append(tile_index)
+        if dependencies is not None: dependencies[tile_index].extend(other_tile for other_tile in dependency if other_tile != tile_index)
+    return True, tiles_modified
+
 MAX_RULES = 6
-# [three-in-a-row, balancing, cloning, rule-4, multicolor-balancing]
+# [three-in-a-row, balancing, cloning, rule-4, multicolor-balancing, line-solving]
+# line-solving is only used if `usable_rules` is a list that enables it.
 
 def solve(size:tuple[int,int]|int, colors:int, tiles:list[list[int]], desired_tile_index:int|None=None, dependencies:list[list[int]]|None=None, error_on_failure:bool=False, return_on_find:bool=False, usable_rules:list[int]|bool|None=None) -> bool|int:
     '''Solves a board, and returns the tiles list. If `desired_tile_index` is specified or `return_on_find` is True, it will break early.
@@ -321,6 +349,7 @@ def solve(size:tuple[int,int]|int, colors:int, tiles:list[list[int]], desired_ti
     rows_to_solve = get_rows_to_solve(size, tiles)
     columns_to_solve = get_columns_to_solve(size, tiles)
     if usable_rules is None: usable_rules = True
+    uses_line_solving = usable_rules is not True and len(usable_rules) > 5 and bool(usable_rules[5])
     rows_to_solve_expensive = rows_to_solve[:]
     columns_to_solve_expensive = columns_to_solve[:]
     def init_solve_row(row_index:int) -> tuple[list[int],bool]:
@@ -394,6 +423,24 @@ def solve(size:tuple[int,int]|int, colors:int, tiles:list[list[int]], desired_ti
             if return_on_find and was_successful: return did_something, tiles_modified[0]
             finalize_solve(column_index, was_successful, unsolved_columns, tiles_modified)
         return did_something, None
+    def line_solving() -> tuple[bool,None|int]:
+        did_something = False
+        tiles_modified:list[int] = []
+        for row_index in rows_to_solve:
+            index_list, should_continue = init_solve_row(row_index)
+            if should_continue: continue
+            was_successful, tiles_modified = solve_line(colors, index_list, tiles, dependencies)
+            if was_successful: did_something = True
+            if return_on_find and was_successful: return did_something, tiles_modified[0]
+            finalize_solve(row_index, was_successful, unsolved_rows, tiles_modified)
+        for column_index in columns_to_solve:
+            index_list, should_continue = init_solve_column(column_index)
+            if should_continue: continue
+            was_successful, tiles_modified = solve_line(colors, index_list, tiles, dependencies)
+            if was_successful: did_something = True
+            if return_on_find and was_successful: return did_something, tiles_modified[0]
+            finalize_solve(column_index, was_successful, unsolved_columns, tiles_modified)
+        return did_something, None
     def rule_4() -> tuple[bool,None|int]:
         did_something = False
         tiles_modified:list[int] = []
@@ -435,19 +482,25 @@ def solve(size:tuple[int,int]|int, colors:int, tiles:list[list[int]], desired_ti
             unsolved_rows = set(rows_to_solve)
             unsolved_columns = set(columns_to_solve)
 
-            if usable_rules is True or usable_rules[0]:
+            if uses_line_solving: # line-solving finds everything the other rules within a line can.
+                was_successful, return_now_value = line_solving()
+                if return_now_value is not None: return return_now_value
+                if got_desired_tile(): return True
+                if was_successful: did_something = True
+
+            if (usable_rules is True or usable_rules[0]) and not uses_line_solving:
                 was_successful, return_now_value = three_in_a_row()
                 if return_now_value is not None: return return_now_value
                 if got_desired_tile(): return True
                 if was_successful: did_something = True
 
-            if usable_rules is True or usable_rules[1]:
+            if (usable_rules is True or usable_rules[1]) and not uses_line_solving:
                 was_successful, return_now_value = balancing()
                 if return_now_value is not None: return return_now_value
                 if got_desired_tile(): return True
                 if was_successful: did_something = True
 
-            if (usable_rules is True or usable_rules[4]) and colors != 2:
+            if (usable_rules is True or usable_rules[4]) and colors != 2 and not uses_line_solving:
                 was_successful, return_now_value = balancing_possibilities()
                 if return_now_value is not None: return return_now_value
                 if got_desired_tile(): return True
@@ -461,7 +514,7 @@ def solve(size:tuple[int,int]|int, colors:int, tiles:list[list[int]], desired_ti
 
         unsolved_rows = set(rows_to_solve_expensive)
         unsolved_columns = set(columns_to_solve_expensive)
-        if usable_rules is True or (usable_rules[3] is True or usable_rules[3] > 0):
+        if (usable_rules is True or (usable_rules[3] is True or usable_rules[3] > 0)) and not uses_line_solving:
             was_successful, return_now_value = rule_4()
             if return_now_value is not None: return return_now_value
             if got_desired_tile(): return True
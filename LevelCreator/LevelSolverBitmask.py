@@ -0,0 +1,578 @@
+try:
+    import LevelCreator.LevelGenerator as LevelGenerator
+    import LevelCreator.LevelUtilities as LU
+except ImportError:
+    import LevelGenerator
+    import LevelUtilities as LU
+
+# This is the same solver as `LevelSolver`, except that each tile is a bitmask of
+# the colors it can be (see `LU.to_bitmask_board`) instead of a list of colors. It
+# makes the same deductions in the same order, so it can replace `LevelSolver`
+# anywhere the tiles do not need to be lists.
+
+# SOLVE UTILITIES
+
+UNKNOWN = -1 # position of the incomplete tile count in a line's counts.
+count_deltas_cache:dict[int,tuple[list[list[tuple[tuple[int,int],...]]],list[list[int]]]] = {}
+
+def get_count_deltas(colors:int) -> tuple[list[list[tuple[tuple[int,int],...]]],list[list[int]]]:
+    '''Returns how a line's counts change when one of its tiles changes from one bitmask to another, as
+    `deltas[old_tile][new_tile]`, a tuple of (position, change) pairs, and how the total incomplete tile count changes.'''
+    if colors in count_deltas_cache: return count_deltas_cache[colors]
+    def get_counts(tile:int) -> list[int]:
+        counts = [0] * (2 * colors + 1)
+        if tile.bit_count() == 1: counts[tile.bit_length() - 1] = 1
+        else:
+            counts[UNKNOWN] = 1
+            for color_index in range(colors):
+                if tile >> color_index & 1: counts[colors + color_index] = 1
+        return counts
+    tile_counts = [get_counts(tile) for tile in range(1 << colors)]
+    deltas = [[tuple((position, new_count - old_count) for position, (old_count, new_count) in enumerate(zip(old_counts, new_counts)) if old_count != new_count) for new_counts in tile_counts] for old_counts in tile_counts]
+    unknown_deltas = [[new_counts[UNKNOWN] - old_counts[UNKNOWN] for new_counts in tile_counts] for old_counts in tile_counts]
+    count_deltas_cache[colors] = deltas, unknown_deltas
+    return deltas, unknown_deltas
+
+class LineCounts():
+    '''Wraps a board of bitmask tiles and keeps, for each row and column, how many complete tiles of each
+    color it has, how many incomplete tiles can be each color, and how many incomplete tiles it has. Tiles
+    must be changed using `set_tile` to keep the counts correct.'''
+    def __init__(self, size:tuple[int,int], colors:int, tiles:list[int]) -> None:
+        self.size = size
+        self.colors = colors
+        self.tiles = tiles
+        self.deltas, self.unknown_deltas = get_count_deltas(colors)
+        # each line has `colors` complete counts, then `colors` possible counts, then the incomplete count.
+        self.rows:list[list[int]] = [[0] * (2 * colors + 1) for row_index in range(size[1])]
+        self.columns:list[list[int]] = [[0] * (2 * colors + 1) for column_index in range(size[0])]
+        # every tile starts as an empty tile, which is incomplete and can't be any color.
+        for row_counts in self.rows: row_counts[UNKNOWN] = size[0]
+        for column_counts in self.columns: column_counts[UNKNOWN] = size[1]
+        self.unknown_count = size[0] * size[1] # incomplete tiles on the whole board.
+        self.changed_rows:set[int] = set(range(size[1])) # lines changed since `solve_cloning` last indexed them.
+        self.changed_columns:set[int] = set(range(size[0]))
+        EMPTY = 0
+        for tile_index, tile in enumerate(tiles): self.update_counts(tile_index, EMPTY, tile)
+
+    def update_counts(self, tile_index:int, old_tile:int, tile:int) -> None:
+        row_counts = self.rows[tile_index // self.size[0]]
+        column_counts = self.columns[tile_index % self.size[0]]
+        for position, change in self.deltas[old_tile][tile]:
+            row_counts[position] += change
+            column_counts[position] += change
+        self.unknown_count += self.unknown_deltas[old_tile][tile]
+
+    def set_tile(self, tile_index:int, tile:int) -> None:
+        self.update_counts(tile_index, self.tiles[tile_index], tile)
+        self.tiles[tile_index] = tile
+        self.changed_rows.add(tile_index // self.size[0])
+        self.changed_columns.add(tile_index % self.size[0])
+
+class LineQueue(list):
+    '''A list of row or column indexes that also keeps a set of the indexes in it.'''
+    def __init__(self, lines:list[int]|None=None) -> None:
+        super().__init__([] if lines is None else lines)
+        self.members = set(self)
+
+    def extend_new(self, lines:set[int]) -> None:
+        '''Appends the lines that are not already in this queue, in order.'''
+        new_lines = lines - self.members
+        if len(new_lines) == 0: return
+        self.members |= new_lines
+        self.extend(sorted(new_lines))
+
+    def remove(self, line:int) -> None:
+        super().remove(line)
+        self.members.discard(line)
+
+def get_rows_to_solve(size:tuple[int,int], counts:LineCounts) -> list[int]:
+    '''Returns the row indexes that contain at least one non-complete tile and at least one complete tile.'''
+    return [row_index for row_index, row_counts in enumerate(counts.rows) if 0 < row_counts[UNKNOWN] < size[0]]
+def get_columns_to_solve(size:tuple[int,int], counts:LineCounts) -> list[int]:
+    '''Returns the column indexes that contain at least one non-complete tile and at least one complete tile.'''
+    return [column_index for column_index, column_counts in enumerate(counts.columns) if 0 < column_counts[UNKNOWN] < size[1]]
+
+def add_full_rows(counts:LineCounts, rows_to_solve:list[int], columns_to_solve:list[int], unsolved_rows:set[int], unsolved_columns:set[int]) -> None:
+    for row_index in rows_to_solve:
+        if counts.rows[row_index][UNKNOWN] == 0: unsolved_rows.add(row_index)
+    for column_index in columns_to_solve:
+        if counts.columns[column_index][UNKNOWN] == 0: unsolved_columns.add(column_index)
+
+def add_tiles_to_axes_to_solve(size, tiles_modified:list[int], rows_to_solves:list[LineQueue], columns_to_solves:list[LineQueue], unsolved_rows:set[int], unsolved_columns:set[int]) -> None:
+    '''Appends to rows_to_solve and columns_to_solve using the modified tiles.'''
+    if len(tiles_modified) == 0: return
+    rows = set([tile_modified // size[0] for tile_modified in tiles_modified])
+    columns = set([tile_modified % size[0] for tile_modified in tiles_modified])
+    if unsolved_rows is not None: unsolved_rows -= rows
+    if unsolved_columns is not None: unsolved_columns -= columns
+
+    for rows_to_solve in rows_to_solves: rows_to_solve.extend_new(rows)
+    for columns_to_solve in columns_to_solves: columns_to_solve.extend_new(columns)
+
+# SOLVERS
+
+def solve_three_in_a_row(colors:int, indexes:list[int], counts:LineCounts, dependencies:list[list[int]]|None) -> tuple[bool,list[int]]:
+    '''Solves for three-in-a-row on a row or column using the given indexes. Modifies the counted tiles. Returns if it changed a tile and the indexes of the tiles it modified.'''
+    tiles = counts.tiles
+    was_successful = False
+    tiles_modified:list[int] = []
+
+    previous_tile1:int|None = None # tile before current
+    previous_tile2:int|None = None # tile twice before current
+    previous_tile3:int|None = None # tile thrice before current; used for finding value on other side of three-in-a-row
+
+    for tile_index in indexes + [None]:
+        if previous_tile2 is not None:
+            color = tiles[previous_tile2] # only a complete tile here can make a three-in-a-row.
+            if color.bit_count() == 1:
+                if tiles[previous_tile1] == color: # caps
+                    if tile_index is not None and tiles[tile_index] & color: # tile after cap
+                        counts.set_tile(tile_index, tiles[tile_index] & ~color)
+                        if dependencies is not None: dependencies[tile_index].extend([previous_tile1, previous_tile2])
+                        was_successful = True
+                        tiles_modified.append(tile_index)
+                    if previous_tile3 is not None and tiles[previous_tile3] & color: # tile before cap
+                        counts.set_tile(previous_tile3, tiles[previous_tile3] & ~color)
+                        if dependencies is not None: dependencies[previous_tile3].extend([previous_tile1, previous_tile2])
+                        was_successful = True
+                        tiles_modified.append(previous_tile3)
+
+                if tile_index is not None and tiles[tile_index] == color: # between
+                    if tiles[previous_tile1] & color:
+                        counts.set_tile(previous_tile1, tiles[previous_tile1] & ~color)
+                        if dependencies is not None: dependencies[previous_tile1].extend([tile_index, previous_tile2])
+                        was_successful = True
+                        tiles_modified.append(previous_tile1)
+
+        previous_tile3 = previous_tile2
+        previous_tile2 = previous_tile1
+        previous_tile1 = tile_index
+    return was_successful, tiles_modified
+
+def solve_balancing(size:int, colors:int, indexes:list[int], line_counts:list[int], counts:LineCounts, dependencies:list[list[int]]|None) -> tuple[bool,list[int]]:
+    tiles = counts.tiles
+    max_per_row = size // colors
+    did_something = False
+    tiles_modified:list[int] = []
+    for color_index in range(colors):
+        # the counts change as tiles are set, so they are read again for each color.
+        if line_counts[color_index] != max_per_row or line_counts[colors + color_index] == 0: continue
+        color = 1 << color_index
+        dependency = [tile_index for tile_index in indexes if tiles[tile_index] == color] if dependencies is not None else None
+        for tile_index in indexes:
+            tile = tiles[tile_index]
+            if tile & color and tile != color:
+                counts.set_tile(tile_index, tile & ~color)
+                if tile_index not in tiles_modified: tiles_modified.append(tile_index)
+                if dependencies is not None: dependencies[tile_index].extend(dependency)
+                did_something = True
+    return did_something, tiles_modified
+
+def encode_line(colors:int, tiles:list[int], indexes:list[int]) -> int:
+    '''Returns the tiles at `indexes` packed into one int, `colors` bits per tile.'''
+    line_key = 0
+    for tile_index in reversed(indexes): line_key = line_key << colors | tiles[tile_index]
+    return line_key
+
+class CloningIndex():
+    '''Keeps, for the lines of one axis, a hashed index of the complete lines and of every way to complete the
+    lines missing two tiles, keyed by `encode_line`. `update` only re-indexes the lines it is given.'''
+    def __init__(self, colors:int, lines_indexes:list[list[int]]) -> None:
+        self.colors = colors
+        self.lines_indexes = lines_indexes
+        self.full_lines:dict[int,set[int]] = {} # line key -> positions of the complete lines with it.
+        self.completions:dict[int,dict[int,tuple[int,int]]] = {} # line key -> {position of a line missing two tiles: offsets of those tiles}
+        self.full_keys:list[int|None] = [None] * len(lines_indexes) # key each complete line is indexed under.
+        self.completion_keys:list[list[int]] = [[] for line_indexes in lines_indexes] # keys each line missing two tiles is indexed under.
+
+    def update(self, tiles:list[int], lines_counts:list[list[int]], line_positions:set[int]) -> None:
+        colors = self.colors
+        for line_position in line_positions:
+            # REMOVE OLD KEYS
+            full_key = self.full_keys[line_position]
+            if full_key is not None:
+                self.full_lines[full_key].discard(line_position)
+                if len(self.full_lines[full_key]) == 0: del self.full_lines[full_key]
+                self.full_keys[line_position] = None
+            for line_key in self.completion_keys[line_position]:
+                del self.completions[line_key][line_position]
+                if len(self.completions[line_key]) == 0: del self.completions[line_key]
+            self.completion_keys[line_position] = []
+            # ADD NEW KEYS
+            match lines_counts[line_position][UNKNOWN]:
+                case 2:
+                    line_indexes = self.lines_indexes[line_position]
+                    line_key = encode_line(colors, tiles, line_indexes)
+                    offset1, offset2 = [offset for offset, tile_index in enumerate(line_indexes) if tiles[tile_index].bit_count() != 1]
+                    tile1 = tiles[line_indexes[offset1]]; tile2 = tiles[line_indexes[offset2]]
+                    shift1 = offset1 * colors; shift2 = offset2 * colors
+                    line_key -= tile1 << shift1 | tile2 << shift2 # both tiles become empty.
+                    for color1 in range(tile1.bit_length()):
+                        if not tile1 >> color1 & 1: continue
+                        for color2 in range(tile2.bit_length()):
+                            if color1 == color2 or not tile2 >> color2 & 1: continue
+                            new_key = line_key | 1 << color1 << shift1 | 1 << color2 << shift2
+                            self.completions.setdefault(new_key, {})[line_position] = (offset1, offset2)
+                            self.completion_keys[line_position].append(new_key)
+                case 0:
+                    full_key = encode_line(colors, tiles, self.lines_indexes[line_position])
+                    self.full_lines.setdefault(full_key, set()).add(line_position)
+                    self.full_keys[line_position] = full_key
+
+    def get_matches(self) -> list[tuple[int,int,tuple[int,int]]]:
+        '''Returns (full line position, empty line position, offsets of the empty tiles) for each distinct complete line that
+        a line missing two tiles can be completed into. Only the first complete line and the first line missing two tiles
+        with each key are used, and the matches are ordered by the complete line's position.'''
+        matches = []
+        for line_key in self.full_lines.keys() & self.completions.keys():
+            completions = self.completions[line_key]
+            empty_line_position = min(completions)
+            matches.append((min(self.full_lines[line_key]), empty_line_position, completions[empty_line_position]))
+        matches.sort()
+        return matches
+
+def get_cloning_indexes(size:tuple[int,int], counts:LineCounts) -> tuple[CloningIndex,CloningIndex]:
+    '''Returns the row and column `CloningIndex`es of a board. They are filled in by `solve_cloning`.'''
+    rows_index = CloningIndex(counts.colors, [LU.get_row_indexes(size, row_index) for row_index in range(size[1])])
+    columns_index = CloningIndex(counts.colors, [LU.get_column_indexes(size, column_index) for column_index in range(size[0])])
+    return rows_index, columns_index
+
+def solve_cloning(size:tuple[int,int], counts:LineCounts, dependencies:list[list[int]]|None=None, cloning_indexes:tuple[CloningIndex,CloningIndex]|None=None) -> tuple[bool,list[int]]:
+    '''If a line missing two tiles can be completed into a complete line, then its two tiles can't be that way. If
+    `cloning_indexes` is specified, only lines changed since its last use are re-indexed.'''
+    def apply_dependencies(empty_line_indexes:list[int], full_line_indexes:list[int], empty_tile1:int, empty_tile2:int) -> None:
+        dependency = empty_line_indexes[:]
+        dependency.extend(full_line_indexes)
+        dependency.remove(empty_tile1)
+        dependency.remove(empty_tile2)
+        dependencies[empty_tile1].extend(dependency)
+        dependencies[empty_tile2].extend(dependency[:])
+    def solve_lines(cloning_index:CloningIndex, lines_counts:list[list[int]], changed_lines:set[int]) -> None:
+        nonlocal was_successful
+        cloning_index.update(tiles, lines_counts, changed_lines)
+        changed_lines.clear()
+        for full_line_position, empty_line_position, (offset1, offset2) in cloning_index.get_matches():
+            full_line_indexes = cloning_index.lines_indexes[full_line_position]
+            empty_line_indexes = cloning_index.lines_indexes[empty_line_position]
+            empty_index1 = empty_line_indexes[offset1]; empty_index2 = empty_line_indexes[offset2]
+            counts.set_tile(empty_index1, tiles[empty_index1] & ~tiles[full_line_indexes[offset1]])
+            counts.set_tile(empty_index2, tiles[empty_index2] & ~tiles[full_line_indexes[offset2]])
+            if dependencies is not None: apply_dependencies(empty_line_indexes, full_line_indexes, empty_index1, empty_index2)
+            was_successful = True
+            if empty_index1 not in tiles_modified: tiles_modified.append(empty_index1)
+            if empty_index2 not in tiles_modified: tiles_modified.append(empty_index2)
+    tiles = counts.tiles
+    was_successful = False
+    tiles_modified:list[int] = []
+    if cloning_indexes is None:
+        cloning_indexes = get_cloning_indexes(size, counts)
+        counts.changed_rows.update(range(size[1])); counts.changed_columns.update(range(size[0]))
+    rows_index, columns_index = cloning_indexes
+    solve_lines(rows_index, counts.rows, counts.changed_rows)
+    solve_lines(columns_index, counts.columns, counts.changed_columns)
+    return was_successful, tiles_modified
+
+def solve_balancing_possibilities(size:int, colors:int, indexes:list[int], line_counts:list[int], counts:LineCounts, dependencies:list[list[int]]|None) -> tuple[bool,list[int]]:
+    '''if the sum of the number of tiles that could be a certain color and the number of tiles that are known to be that color is the maximum that can be in that row or column,
+    then all tiles that can possibly be that color are and only are that color.'''
+    max_per_row = size // colors
+    full_colors_counts = line_counts[:colors]
+    solvable_colors = [color_index for color_index in range(colors) if full_colors_counts[color_index] != max_per_row and full_colors_counts[color_index] + line_counts[colors + color_index] == max_per_row]
+    if len(solvable_colors) == 0: return False, []
+    tiles = counts.tiles
+    empty_colors:list[list[int]] = [[] for i in range(colors)] # tracks indexes of possibilities.
+    not_colors:list[list[int]] = [[] for i in range(colors)] # tracks tiles that can not be a certain color.
+    for tile_index in indexes:
+        tile = tiles[tile_index]
+        if tile.bit_count() == 1:
+            if dependencies is not None:
+                color_index = tile.bit_length() - 1
+                for other_color_index in range(colors):
+                    if other_color_index != color_index: not_colors[other_color_index].append(tile_index)
+        else:
+            for color_index in range(colors):
+                if tile >> color_index & 1: empty_colors[color_index].append(tile_index)
+                elif dependencies is not None: not_colors[color_index].append(tile_index)
+    tiles_modified:list[int] = []
+    for color_index in solvable_colors:
+        if dependencies is not None: dependency = not_colors[color_index]
+        for tile_index in empty_colors[color_index]:
+            counts.set_tile(tile_index, 1 << color_index)
+            if dependencies is not None: dependencies[tile_index].extend(dependency)
+        tiles_modified.extend(empty_colors[color_index])
+        if max_per_row <= 2: break
+    return True, tiles_modified
+
+def solve_rule_4(size:int, colors:int, indexes:list[int], line_counts:list[int], counts:LineCounts, dependencies:list[list[int]]|None=None, maximum:int|None=None) -> tuple[bool,list[int]]:
+    '''if the row contains the same amount of reds missing and blues missing, return without doing anything.
+    Otherwise, for each empty tile, do the following: place the less common color there. Then for each other tile, place the more common color by default,
+    but place the less common color if there would be a three-in-a-row error otherwise. If the number of additional less common tiles exceeds that color's
+    original missing count, then the placed tile is not the less common color.'''
+    full_color_counts = line_counts[:colors]
+    if [full_color_counts[color_index] + line_counts[colors + color_index] for color_index in range(colors)].count(0) != colors - 2: return False, []
+    if full_color_counts.count(0) != colors - 2: return False, []
+    more_common_color = None; less_common_color = None
+    for color_index, amount in enumerate(full_color_counts):
+        if amount == 0: continue
+        if more_common_color is None: more_common_color = color_index
+        else:
+            if full_color_counts[more_common_color] > amount: less_common_color = color_index
+            else: more_common_color, less_common_color = color_index, more_common_color
+    if full_color_counts[more_common_color] == full_color_counts[less_common_color]: return False, []
+    max_per_row = size // colors
+    if full_color_counts[more_common_color] == max_per_row or full_color_counts[less_common_color] == max_per_row: return False, []
+    if maximum is not None and max_per_row - full_color_counts[less_common_color] > maximum: return False, []
+    LESS_COMMON = 1 << less_common_color
+    MORE_COMMON = 1 << more_common_color
+    def add_to_involved(indexes:list[int]) -> None:
+        for index in indexes:
+            if index not in tiles_involved_in_error: tiles_involved_in_error.append(index)
+        testing_row[empty_index] = MORE_COMMON
+
+    tiles = counts.tiles
+    testing_row = [tiles[tile_index] for tile_index in indexes]
+    full_tile_indexes:list[int] = [tile_index for tile_index in indexes if tiles[tile_index].bit_count() == 1]
+    empty_indexes:list[int] = [index for index, tile in enumerate(testing_row) if tile.bit_count() != 1] # indexes in `indexes`
+    tiles_involved_in_error:list[int] = [] # indexes with `indexes` that were involved in an error.
+    error_count = 0 # how many times it did a bad.
+    for empty_index in empty_indexes:
+        previous_index1 = empty_index - 1
+        previous_index2 = empty_index - 2
+        next_index1 = empty_index + 1
+        next_index2 = empty_index + 2
+        if previous_index1 >= 0 and next_index1 < size and testing_row[previous_index1] == LESS_COMMON and testing_row[next_index1] == LESS_COMMON:
+            add_to_involved([previous_index1, next_index1, empty_index]); error_count += 1
+        elif previous_index2 >= 0 and testing_row[previous_index2] == LESS_COMMON and testing_row[previous_index1] == LESS_COMMON:
+            add_to_involved([previous_index2, previous_index1, empty_index]); error_count += 1
+        elif next_index2 < size and testing_row[next_index2] == LESS_COMMON and testing_row[next_index1] == LESS_COMMON:
+            add_to_involved([next_index2, next_index1, empty_index]); error_count += 1
+        else:
+            testing_row[empty_index] = LESS_COMMON
+    tiles_modified:list[int] = []
+    if error_count >= max_per_row - full_color_counts[more_common_color]:
+        for empty_index in empty_indexes:
+            if empty_index in tiles_involved_in_error: continue
+            tile_index = indexes[empty_index]
+            tiles_modified.append(tile_index)
+            counts.set_tile(tile_index, LESS_COMMON)
+            if dependencies is not None: dependencies[tile_index] = full_tile_indexes[:]
+    return len(tiles_modified) > 0, tiles_modified
+
+MAX_LINE_POSSIBILITIES_CACHE = 65536 # lines per (length, colors) before the cache is cleared.
+line_possibilities_cache:dict[tuple[int,int],dict[tuple[int,...],tuple[int,...]]] = {}
+
+def get_line_possibilities(colors:int, line:tuple[int,...]) -> tuple[int,...]:
+    '''Returns the line with each tile narrowed to the colors it has in at least one valid line (see
+    `LevelGenerator.get_valid_rows`) that fits all of the given tiles.'''
+    cache = line_possibilities_cache.setdefault((len(line), colors), {})
+    # another thread can clear `cache` at any time, so a line is never looked up twice.
+    result = cache.get(line)
+    if result is not None: return result
+    bitsets = LevelGenerator.get_valid_row_bitsets(len(line), colors)
+    fitting_lines = -1 # bitset of valid lines that fit the tiles so far; -1 has every bit set.
+    for position, tile in enumerate(line):
+        position_bitsets = bitsets[position]
+        if tile.bit_count() == 1: fitting_lines &= position_bitsets[tile.bit_length() - 1]
+        else:
+            tile_lines = 0
+            for color_index in range(colors):
+                if tile >> color_index & 1: tile_lines |= position_bitsets[color_index]
+            fitting_lines &= tile_lines
+        if fitting_lines == 0: break
+    output:list[int] = []
+    for position, tile in enumerate(line):
+        if fitting_lines == 0: output.append(0)
+        elif tile.bit_count() == 1: output.append(tile)
+        else:
+            possibilities = 0
+            for color_index in range(colors):
+                if tile >> color_index & 1 and fitting_lines & bitsets[position][color_index]: possibilities |= 1 << color_index
+            output.append(possibilities)
+    result = tuple(output)
+    if len(cache) >= MAX_LINE_POSSIBILITIES_CACHE: cache.clear()
+    cache[line] = result
+    return result
+
+def solve_line(colors:int, indexes:list[int], counts:LineCounts, dependencies:list[list[int]]|None) -> tuple[bool,list[int]]:
+    '''Narrows each tile of a row or column to the colors it has in the valid lines that fit the rest of it. This
+    finds everything that three-in-a-row, balancing and rule 4 can find within one line.'''
+    tiles = counts.tiles
+    line = tuple(tiles[tile_index] for tile_index in indexes)
+    possibilities = get_line_possibilities(colors, line)
+    if possibilities == line: return False, []
+    if dependencies is not None:
+        DEFAULT = LU.get_default_bitmask(colors)
+        dependency = [tile_index for position, tile_index in enumerate(indexes) if line[position] != DEFAULT]
+    tiles_modified:list[int] = []
+    for position, tile_index in enumerate(indexes):
+        if possibilities[position] == line[position]: continue
+        counts.set_tile(tile_index, possibilities[position])
+        tiles_modified.append(tile_index)
+        if dependencies is not None: dependencies[tile_index].extend(other_tile for other_tile in dependency if other_tile != tile_index)
+    return True, tiles_modified
+
+class SolverContext():
+    '''What `solve` keeps about a board between calls: its counts, cloning indexes, and the lines left to solve. After
+    some tiles are changed using `set_tile`, solving again only looks at their lines and any left over from before.'''
+    def __init__(self, size:tuple[int,int], colors:int, tiles:list[int]) -> None:
+        self.size = size
+        self.counts = LineCounts(size, colors, tiles)
+        self.rows_to_solve = LineQueue(get_rows_to_solve(size, self.counts))
+        self.columns_to_solve = LineQueue(get_columns_to_solve(size, self.counts))
+        self.rows_to_solve_expensive = LineQueue(self.rows_to_solve)
+        self.columns_to_solve_expensive = LineQueue(self.columns_to_solve)
+        self.row_indexes = [LU.get_row_indexes(size, row_index) for row_index in range(size[1])]
+        self.column_indexes = [LU.get_column_indexes(size, column_index) for column_index in range(size[0])]
+        self.cloning_indexes = get_cloning_indexes(size, self.counts)
+
+    def set_tile(self, tile_index:int, tile:int) -> None:
+        '''Changes a tile of the board and marks its row and column to be solved again.'''
+        if self.counts.tiles[tile_index] == tile: return
+        self.counts.set_tile(tile_index, tile)
+        add_tiles_to_axes_to_solve(self.size, [tile_index], [self.rows_to_solve, self.rows_to_solve_expensive], [self.columns_to_solve, self.columns_to_solve_expensive], None, None)
+
+MAX_RULES = 6
+# [three-in-a-row, balancing, cloning, rule-4, multicolor-balancing, line-solving]
+# line-solving is only used if `usable_rules` is a list that enables it.
+
+def solve(size:tuple[int,int]|int, colors:int, tiles:list[int], desired_tile_index:int|list[int]|None=None, dependencies:list[list[int]]|None=None, error_on_failure:bool=False, return_on_find:bool=False, usable_rules:list[int]|bool|None=None, gen_info:LU.GenerationInfo|None=None, context:"SolverContext|None"=None) -> bool|int:
+    '''Solves a board of bitmask tiles in place. If `desired_tile_index` is specified or `return_on_find` is True, it will break early.
+    If `dependencies` is specified, it will extend items of the list with the tiles required to find them. Returns
+    if it was able to find the desired tile or not. If `gen_info` is specified, its solver counters are increased. If
+    `context` is specified, it must have been made for `tiles`, and it is picked up from and left as this call ends.
+    `desired_tile_index` may also be a list of tiles, in which case it breaks early once it has found all of them.'''
+    if isinstance(size, int): size = (size, size)
+    desired_tile_indexes = [desired_tile_index] if isinstance(desired_tile_index, int) else desired_tile_index
+    if gen_info is not None: gen_info.solver_calls += 1
+    if context is None: context = SolverContext(size, colors, tiles)
+    elif context.counts.tiles is not tiles: raise ValueError("Solver context is for a different board!")
+    counts = context.counts
+    rows_to_solve = context.rows_to_solve
+    columns_to_solve = context.columns_to_solve
+    if usable_rules is None: usable_rules = True
+    uses_line_solving = usable_rules is not True and len(usable_rules) > 5 and bool(usable_rules[5])
+    rows_to_solve_expensive = context.rows_to_solve_expensive
+    columns_to_solve_expensive = context.columns_to_solve_expensive
+    row_indexes = context.row_indexes
+    column_indexes = context.column_indexes
+    cloning_indexes = context.cloning_indexes
+    def finalize_solve(row_index:int, was_successful:bool, unsolved_axis:set[int], tiles_modified:list[int]) -> None:
+        if was_successful: unsolved_axis.discard(row_index)
+        add_tiles_to_axes_to_solve(size, tiles_modified, [rows_to_solve, rows_to_solve_expensive], [columns_to_solve, columns_to_solve_expensive], unsolved_rows, unsolved_columns)
+    def got_desired_tile() -> bool:
+        return was_successful and desired_tile_indexes is not None and all(tiles[tile_index].bit_count() == 1 for tile_index in desired_tile_indexes)
+
+    def solve_axes(row_rule, column_rule, rows:list[int], columns:list[int]) -> tuple[bool,None|int]:
+        '''Applies `row_rule` to each of the rows, then `column_rule` to each of the columns. Both take the index list and counts of the line.'''
+        did_something = False
+        for row_index in rows:
+            row_counts = counts.rows[row_index]
+            if row_counts[UNKNOWN] == 0: continue
+            was_successful, tiles_modified = row_rule(row_indexes[row_index], row_counts)
+            if was_successful: did_something = True
+            if return_on_find and was_successful: return did_something, tiles_modified[0]
+            finalize_solve(row_index, was_successful, unsolved_rows, tiles_modified)
+        for column_index in columns:
+            column_counts = counts.columns[column_index]
+            if column_counts[UNKNOWN] == 0: continue
+            was_successful, tiles_modified = column_rule(column_indexes[column_index], column_counts)
+            if was_successful: did_something = True
+            if return_on_find and was_successful: return did_something, tiles_modified[0]
+            finalize_solve(column_index, was_successful, unsolved_columns, tiles_modified)
+        return did_something, None
+    def three_in_a_row() -> tuple[bool,None|int]:
+        rule = lambda index_list, line_counts: solve_three_in_a_row(colors, index_list, counts, dependencies)
+        return solve_axes(rule, rule, rows_to_solve, columns_to_solve)
+    def balancing() -> tuple[bool,None|int]:
+        row_rule = lambda index_list, line_counts: solve_balancing(size[0], colors, index_list, line_counts, counts, dependencies)
+        column_rule = lambda index_list, line_counts: solve_balancing(size[1], colors, index_list, line_counts, counts, dependencies)
+        return solve_axes(row_rule, column_rule, rows_to_solve, columns_to_solve)
+    def balancing_possibilities() -> tuple[bool,None|int]:
+        row_rule = lambda index_list, line_counts: solve_balancing_possibilities(size[0], colors, index_list, line_counts, counts, dependencies)
+        column_rule = lambda index_list, line_counts: solve_balancing_possibilities(size[1], colors, index_list, line_counts, counts, dependencies)
+        return solve_axes(row_rule, column_rule, rows_to_solve, columns_to_solve)
+    def line_solving() -> tuple[bool,None|int]:
+        rule = lambda index_list, line_counts: solve_line(colors, index_list, counts, dependencies)
+        return solve_axes(rule, rule, rows_to_solve, columns_to_solve)
+    def rule_4() -> tuple[bool,None|int]:
+        did_something = False
+        if usable_rules is True or usable_rules[3] is True: maximum = None
+        else: maximum = usable_rules[3]
+        if size[1] // colors > 2:
+            row_maximum = min(maximum, int(size[0] // colors)) if maximum is not None else None
+            row_rule = lambda index_list, line_counts: solve_rule_4(size[0], colors, index_list, line_counts, counts, dependencies, row_maximum)
+            did_something, return_now_value = solve_axes(row_rule, None, rows_to_solve_expensive, [])
+            if return_now_value is not None: return did_something, return_now_value
+        if size[0] // colors > 2:
+            column_maximum = min(maximum, int(size[1] // colors)) if maximum is not None else None
+            column_rule = lambda index_list, line_counts: solve_rule_4(size[1], colors, index_list, line_counts, counts, dependencies, column_maximum)
+            was_successful, return_now_value = solve_axes(None, column_rule, [], columns_to_solve_expensive)
+            if was_successful: did_something = True
+            if return_now_value is not None: return did_something, return_now_value
+        return did_something, None
+
+    total_tries = 0
+    while counts.unknown_count != 0:
+        if total_tries != 0 and not did_something:
+            if error_on_failure:
+                LU.print_board(LU.from_bitmask_board(tiles), size)
+                print(usable_rules)
+                raise RuntimeError("Failed to solve board!")
+            else: return False
+        total_tries += 1
+        if gen_info is not None: gen_info.solver_passes += 1
+        did_something = False
+
+        while len(rows_to_solve) != 0 or len(columns_to_solve) != 0:
+            unsolved_rows = set(rows_to_solve)
+            unsolved_columns = set(columns_to_solve)
+
+            if uses_line_solving: # line-solving finds everything the other rules within a line can.
+                was_successful, return_now_value = line_solving()
+                if return_now_value is not None: return return_now_value
+                if got_desired_tile(): return True
+                if was_successful: did_something = True
+
+            if (usable_rules is True or usable_rules[0]) and not uses_line_solving:
+                was_successful, return_now_value = three_in_a_row()
+                if return_now_value is not None: return return_now_value
+                if got_desired_tile(): return True
+                if was_successful: did_something = True
+
+            if (usable_rules is True or usable_rules[1]) and not uses_line_solving:
+                was_successful, return_now_value = balancing()
+                if return_now_value is not None: return return_now_value
+                if got_desired_tile(): return True
+                if was_successful: did_something = True
+
+            if (usable_rules is True or usable_rules[4]) and colors != 2 and not uses_line_solving:
+                was_successful, return_now_value = balancing_possibilities()
+                if return_now_value is not None: return return_now_value
+                if got_desired_tile(): return True
+                if was_successful: did_something = True
+
+            add_full_rows(counts, rows_to_solve, columns_to_solve, unsolved_rows, unsolved_columns)
+            for unsolved_row in unsolved_rows: rows_to_solve.remove(unsolved_row)
+            for unsolved_column in unsolved_columns: columns_to_solve.remove(unsolved_column)
+
+        # expensive rules go down here.
+
+        unsolved_rows = set(rows_to_solve_expensive)
+        unsolved_columns = set(columns_to_solve_expensive)
+        if (usable_rules is True or (usable_rules[3] is True or usable_rules[3] > 0)) and not uses_line_solving:
+            was_successful, return_now_value = rule_4()
+            if return_now_value is not None: return return_now_value
+            if got_desired_tile(): return True
+            if was_successful: did_something = True
+
+        if usable_rules is True or usable_rules[2]:
+            was_successful, tiles_modified = solve_cloning(size, counts, dependencies, cloning_indexes)
+            add_tiles_to_axes_to_solve(size, tiles_modified, [rows_to_solve, rows_to_solve_expensive], [columns_to_solve, columns_to_solve_expensive], unsolved_rows, unsolved_columns)
+            if return_on_find and len(tiles_modified) > 0: return tiles_modified[0]
+            if was_successful: did_something = True
+            if got_desired_tile(): return True
+
+        for unsolved_row in unsolved_rows: rows_to_solve_expensive.remove(unsolved_row)
+        for unsolved_column in unsolved_columns: columns_to_solve_expensive.remove(unsolved_column)
+
+    if desired_tile_indexes is not None: return all(tiles[tile_index].bit_count() == 1 for tile_index in desired_tile_indexes)
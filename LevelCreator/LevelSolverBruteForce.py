@@ -2,10 +2,12 @@ from typing import Iterator
 
 try:
     import LevelCreator.LevelSolver as LevelSolver
+    import LevelCreator.LevelSolverBitmask as LevelSolverBitmask
     import LevelCreator.LevelUtilities as LU
     import LevelCreator.LevelValidator as LevelValidator
 except ImportError:
     import LevelSolver
+    import LevelSolverBitmask
     import LevelUtilities as LU
     import LevelValidator
 
@@ -40,12 +42,12 @@ def get_all_boards(size:tuple[int,int], colors:int, tiles:list[list[int]]) -> It
             new_tiles[tile_index] = [tiles[tile_index][color_index]]
         yield new_tiles
 
-def solve(size:tuple[int,int], colors:int, tiles:list[list[int]]) -> list[list[int]]:
-    '''Returns a list of possible complete boards that match the given incomplete board.'''
+def solve_by_enumeration(size:tuple[int,int], colors:int, tiles:list[list[int]]) -> list[list[int]]:
+    '''Returns a list of possible complete boards that match the given incomplete board by trying every combination of
+    the unknown tiles. This is very slow, but does not depend on the solver's rules; see `solve`.'''
     if [] in tiles: return []
     start_tiles = LU.copy_tiles(tiles)
     LevelSolver.solve(size, colors, start_tiles)
-    get_all_boards(size, colors, start_tiles)
     yes_boards:list[list[int]] = []
     for new_board in get_all_boards(size, colors, start_tiles):
         assert all(len(tile) == 1 for tile in new_board)
@@ -53,6 +55,70 @@ def solve(size:tuple[int,int], colors:int, tiles:list[list[int]]) -> list[list[i
             yes_boards.append(LU.collapse_board(new_board, colors, True))
     return yes_boards
 
+def is_consistent(size:tuple[int,int], colors:int, tiles:list[int], lines_indexes:list[tuple[int,list[int]]]) -> bool:
+    '''Returns False if the board of bitmask tiles cannot be completed, because a tile can't be any color, there are three
+    complete tiles of the same color in a row, a line has too many or can't have enough of a color, or two complete lines
+    are the same. `lines_indexes` has the axis (0 for rows, 1 for columns) and indexes of each line.'''
+    if 0 in tiles: return False
+    full_lines:set[tuple[int,tuple[int,...]]] = set()
+    for axis, line_indexes in lines_indexes:
+        line = tuple(tiles[tile_index] for tile_index in line_indexes)
+        maximum = len(line) // colors
+        for index in range(2, len(line)):
+            if line[index] == line[index - 1] == line[index - 2] and line[index].bit_count() == 1: return False
+        for color_index in range(colors):
+            color = 1 << color_index
+            if line.count(color) > maximum: return False
+            if sum(1 for tile in line if tile & color) < maximum: return False
+        if all(tile.bit_count() == 1 for tile in line):
+            if (axis, line) in full_lines: return False
+            full_lines.add((axis, line))
+    return True
+
+def search(size:tuple[int,int]|int, colors:int, tiles:list[list[int]]|list[int], limit:int|None=None, usable_rules:list[int]|None=None) -> list[list[int]]:
+    '''Returns up to `limit` of the complete boards that match the given incomplete board, as boards of bitmask tiles.
+    `tiles` may be a list of lists or of bitmasks. It alternates solving as far as `LevelSolverBitmask` can using
+    `usable_rules` with guessing each color of the incomplete tile with the fewest colors and the fewest incomplete tiles
+    in its row and column.'''
+    if isinstance(size, int): size = (size, size)
+    if len(tiles) > 0 and isinstance(tiles[0], list): tiles = LU.to_bitmask_board(tiles)
+    lines_indexes = [(0, LU.get_row_indexes(size, row_index)) for row_index in range(size[1])] + [(1, LU.get_column_indexes(size, column_index)) for column_index in range(size[0])]
+    solutions:list[list[int]] = []
+    def search_from(tiles:list[int]) -> None:
+        if not is_consistent(size, colors, tiles, lines_indexes): return
+        LevelSolverBitmask.solve(size, colors, tiles, usable_rules=usable_rules)
+        if not is_consistent(size, colors, tiles, lines_indexes): return
+        unknown_tiles = [tile_index for tile_index, tile in enumerate(tiles) if tile.bit_count() != 1]
+        if len(unknown_tiles) == 0:
+            solutions.append(tiles)
+            return
+        row_unknowns = [0] * size[1]; column_unknowns = [0] * size[0]
+        for tile_index in unknown_tiles:
+            row_unknowns[tile_index // size[0]] += 1
+            column_unknowns[tile_index % size[0]] += 1
+        guess_index = min(unknown_tiles, key=lambda tile_index: (tiles[tile_index].bit_count(), row_unknowns[tile_index // size[0]] + column_unknowns[tile_index % size[0]]))
+        for color_index in range(colors):
+            if not tiles[guess_index] >> color_index & 1: continue
+            new_tiles = tiles[:]
+            new_tiles[guess_index] = 1 << color_index
+            search_from(new_tiles)
+            if limit is not None and len(solutions) >= limit: return
+    search_from(list(tiles))
+    return solutions
+
+def count_solutions(size:tuple[int,int]|int, colors:int, tiles:list[list[int]]|list[int], limit:int|None=2, usable_rules:list[int]|None=None) -> int:
+    '''Returns how many complete boards match the given incomplete board, counting no higher than `limit`. A limit of 2
+    is enough to check that a puzzle has exactly one solution.'''
+    return len(search(size, colors, tiles, limit, usable_rules))
+
+def has_unique_solution(size:tuple[int,int]|int, colors:int, tiles:list[list[int]]|list[int], usable_rules:list[int]|None=None) -> bool:
+    return count_solutions(size, colors, tiles, 2, usable_rules) == 1
+
+def solve(size:tuple[int,int], colors:int, tiles:list[list[int]], limit:int|None=None) -> list[list[int]]:
+    '''Returns a list of possible complete boards that match the given incomplete board, stopping after `limit` boards.'''
+    if [] in tiles: return []
+    return [LU.collapse_board_bitmask(board, colors, True) for board in search(size, colors, tiles, limit)]
+
 if __name__ == "__main__":
     empty_tiles = {
         (12, 2): LU.board_from_string('''
@@ -0,0 +1,119 @@
+import multiprocessing
+import multiprocessing.pool
+import os
+import random
+
+try:
+    import LevelCreator.LevelCreator as LevelCreator
+    import LevelCreator.LevelSolverBitmask as LevelSolverBitmask
+    import LevelCreator.LevelUtilities as LU
+except ImportError:
+    import LevelCreator
+    import LevelSolverBitmask
+    import LevelUtilities as LU
+
+# Breaks down a board the same way as `LevelCreator.breakdown`, but tries the next
+# removals of `random_range` in worker processes at once. Each worker checks its
+# removals against the puzzle as it was before them, and returns for each removal
+# if it worked and the tiles of the puzzle the removed tile was found from. The
+# removals are then committed in order. One that worked still does if none of
+# the tiles it was found from were removed before it, so only the rest, and
+# failures after a removal earlier in the batch, are checked again.
+# The solves the workers made are not repeated here, so the solver's board lacks
+# what they found. With the default rules, the puzzle has been the same as the
+# one `LevelCreator.breakdown` makes on every seed checked (see
+# `Test.time_test_speculative`). With other rules (e.g. Balancing turned off)
+# what the solver finds depends on what it found before, and the puzzles can
+# differ, so those are broken down by `LevelCreator.breakdown` instead. With more than two colors, a
+# failed removal can leave a tile partly found in the solver's board, which later
+# removals depend on, so those boards are broken down by it, too.
+
+CANDIDATES_PER_WORKER = 4 # removals each worker checks at once.
+
+Job = tuple[tuple[int,int], int, list[int]|None, list[int], list[int]]
+
+def get_found_from(dependencies:LU.DependencyGraph, tile_index:int, puzzle:list[int], DEFAULT:int) -> set[int]:
+    '''Returns the tiles of the puzzle that the tile was found from, directly or not.'''
+    found_from:set[int] = set()
+    visited = set([tile_index])
+    queue = [tile_index]
+    while len(queue) != 0:
+        for dependency in dependencies.forward[queue.pop()]:
+            if dependency in visited: continue
+            visited.add(dependency)
+            if puzzle[dependency] != DEFAULT: found_from.add(dependency)
+            else: queue.append(dependency)
+    return found_from
+
+def check_removals(job:Job) -> list[tuple[bool,set[int]]]:
+    '''Returns, for each candidate, if it can be removed from the puzzle on its own, and the tiles it is found from if so.'''
+    size, colors, usable_rules, puzzle, candidates = job
+    DEFAULT = LU.get_default_bitmask(colors)
+    puzzle = puzzle[:]
+    solver_tiles = puzzle[:]
+    solver_context = LevelSolverBitmask.SolverContext(size, colors, solver_tiles)
+    dependencies = LU.DependencyGraph(size[0] * size[1])
+    output:list[tuple[bool,set[int]]] = []
+    for tile_index in candidates:
+        tile_value = puzzle[tile_index]
+        puzzle[tile_index] = DEFAULT
+        LU.strip_dependencies_to_board(dependencies, tile_index, solver_tiles, puzzle, solver_context.set_tile)
+        was_successful = LevelSolverBitmask.solve(size, colors, solver_tiles, tile_index, dependencies, usable_rules=usable_rules, context=solver_context)
+        output.append((was_successful, get_found_from(dependencies, tile_index, puzzle, DEFAULT) if was_successful else set()))
+        # puts the tile back, so what was found using it is still right.
+        puzzle[tile_index] = tile_value
+        dependencies[tile_index] = []
+        solver_context.set_tile(tile_index, tile_value)
+    return output
+
+def breakdown(tiles:list[int], size:tuple[int,int], seed:int, colors:int=2, usable_rules:list[int]|None=None, gen_info:LU.GenerationInfo|None=None, rng:random.Random|None=None, workers:int|None=None, pool:multiprocessing.pool.Pool|None=None) -> list[int]|None:
+    '''Returns the same puzzle as `LevelCreator.breakdown`, checking removals in `workers` processes (all cores by
+    default) if `usable_rules` is None. If `pool` is specified, it is used instead of starting one, and should have
+    `workers` processes.'''
+    if colors != 2 or usable_rules is not None: return LevelCreator.breakdown(tiles, size, seed, colors, usable_rules, gen_info, rng)
+    if workers is None: workers = os.cpu_count() or 1
+    if workers < 1: raise ValueError("Invalid worker count %i!" % workers)
+    tiles = LU.expand_board_bitmask(colors, tiles)
+
+    if rng is None:
+        if seed is None: seed = LU.get_seed()
+        rng = random.Random(seed)
+    random_range = list(range(size[0] * size[1]))
+    rng.shuffle(random_range)
+    DEFAULT = LU.get_default_bitmask(colors)
+    # the same as in `LevelCreator.breakdown`. Removals from the workers are recorded as
+    # depending on the tiles they were found from.
+    dependencies = LU.DependencyGraph(size[0] * size[1])
+    solver_tiles = tiles[:]
+    solver_context = LevelSolverBitmask.SolverContext(size, colors, solver_tiles)
+    owns_pool = pool is None and workers > 1
+    if owns_pool: pool = multiprocessing.Pool(workers) # one worker checks the removals in this process.
+    try:
+        for batch_start in range(0, len(random_range), workers * CANDIDATES_PER_WORKER):
+            candidates = random_range[batch_start:batch_start + workers * CANDIDATES_PER_WORKER]
+            jobs = [(size, colors, usable_rules, tiles, candidates[job_start:job_start + CANDIDATES_PER_WORKER]) for job_start in range(0, len(candidates), CANDIDATES_PER_WORKER)]
+            results = [result for job_results in (map(check_removals, jobs) if pool is None else pool.map(check_removals, jobs)) for result in job_results]
+            removed:set[int] = set()
+            for tile_index, (was_successful, found_from) in zip(candidates, results):
+                if not was_successful and len(removed) == 0: continue # the puzzle is still the one it was checked against.
+                tile_value = tiles[tile_index]
+                tiles[tile_index] = DEFAULT
+                if was_successful and found_from.isdisjoint(removed):
+                    dependencies[tile_index] = found_from
+                else: # checks it again against the puzzle with the earlier removals.
+                    LU.strip_dependencies_to_board(dependencies, tile_index, solver_tiles, tiles, solver_context.set_tile)
+                    was_successful = LevelSolverBitmask.solve(size, colors, solver_tiles, tile_index, dependencies, usable_rules=usable_rules, gen_info=gen_info, context=solver_context)
+                    if not was_successful:
+                        tiles[tile_index] = tile_value
+                        if solver_tiles[tile_index] == DEFAULT: solver_context.set_tile(tile_index, tile_value)
+                        continue
+                removed.add(tile_index)
+            if gen_info is not None:
+                if gen_info.breaker: return None
+                gen_info.generation_progress = 0.9 + (batch_start / (len(random_range))) * 0.1
+    finally:
+        if owns_pool: pool.terminate()
+    tiles = LU.collapse_board_bitmask(tiles, colors, True)
+    if all([color not in tiles for color in range(1, colors + 1)]): # if there are no non-empty tiles
+        raise RuntimeError("The board is empty!")
+    return tiles
@@ -1,7 +1,11 @@
+import collections
 import random
 import re
+import threading
 
+import numpy
 from numpy import base_repr, binary_repr
+from typing import Callable, Hashable, Iterator
 
 
 def get_row_indexes(size:tuple[int,int], y_position:int) -> list[int]:
@@ -45,14 +49,111 @@ def collapse_board(tiles:list[list[int]], colors:int=None, strict:bool=False) ->
         else: output.append(0)
     return output
 
+# BITMASK BOARDS
+# A bitmask tile is an int with bit `color - 1` set for every color the tile can
+# still be, so [1, 3] is 0b101 and a complete tile has exactly one bit set.
+
+def get_default_bitmask(colors:int) -> int:
+    '''Returns the bitmask of a tile that can be any color.'''
+    return (1 << colors) - 1
+def tile_to_bitmask(tile:list[int]) -> int:
+    output = 0
+    for color in tile: output |= 1 << (color - 1)
+    return output
+def bitmask_to_tile(tile:int) -> list[int]:
+    return [color + 1 for color in range(tile.bit_length()) if tile >> color & 1]
+def bitmask_to_color(tile:int) -> int:
+    '''Returns the color of a complete bitmask tile, or 0 if it is not complete.'''
+    return tile.bit_length() if tile.bit_count() == 1 else 0
+
+def to_bitmask_board(tiles:list[list[int]]) -> list[int]:
+    '''Turns a list of lists of colors (see `expand_board`) into a list of bitmasks.'''
+    return [tile_to_bitmask(tile) for tile in tiles]
+def from_bitmask_board(tiles:list[int]) -> list[list[int]]:
+    '''Turns a list of bitmasks into a list of lists of colors (see `expand_board`).'''
+    return [bitmask_to_tile(tile) for tile in tiles]
+
+def expand_board_bitmask(colors:int, tiles:list[int]) -> list[int]:
+    '''Turns a list of integers into a list of bitmasks.'''
+    DEFAULT = get_default_bitmask(colors)
+    return [DEFAULT if tile == 0 else 1 << (tile - 1) for tile in tiles]
+
+def collapse_board_bitmask(tiles:list[int], colors:int=None, strict:bool=False) -> list[int]:
+    output:list[int] = []
+    for tile_index, tile in enumerate(tiles):
+        if strict and tile == 0: raise ValueError("0-length tile at %s!" % tile_index)
+        tile_length = tile.bit_count()
+        if tile_length == 1: output.append(tile.bit_length())
+        elif strict and tile_length < colors: raise ValueError("%s-length tile at %s!" % (tile_length, tile_index))
+        else: output.append(0)
+    return output
+
 def restore_cache(tiles_values:list[list[int]], tiles_cache:list[list[int]], colors:int) -> None:
     DEFAULT = list(range(1, colors + 1))
     for index, tile in enumerate(tiles_cache):
         if tile != DEFAULT: tiles_values[index] = tile[:]
 
-def strip_dependencies(dependencies:list[list[int]], tile_index:int, tiles_cache:list[list[int]], colors:int) -> None:
-    '''Removes tiles related to the given tile and resets their dependencies''' # TODO: remove the parameter `tiles`
-    DEFAULT = list(range(1, colors + 1))
+class TileDependencies():
+    '''The dependencies of one tile of a `DependencyGraph`. It can be extended like the lists solvers take as `dependencies`.'''
+    __slots__ = ("graph", "tile_index")
+    def __init__(self, graph:"DependencyGraph", tile_index:int) -> None:
+        self.graph = graph
+        self.tile_index = tile_index
+
+    def extend(self, tile_dependencies) -> None:
+        self.graph.add(self.tile_index, tile_dependencies)
+
+    def __iter__(self):
+        return iter(self.graph.forward[self.tile_index])
+
+    def __len__(self) -> int:
+        return len(self.graph.forward[self.tile_index])
+
+class DependencyGraph():
+    '''Keeps, for each tile, the set of tiles it was found using (forward) and the set of tiles that were found using it
+    (reverse). It can be used in place of a list of dependency lists.'''
+    def __init__(self, tile_count:int) -> None:
+        self.forward:list[set[int]] = [set() for tile_index in range(tile_count)]
+        self.reverse:list[set[int]] = [set() for tile_index in range(tile_count)]
+        self.tiles = [TileDependencies(self, tile_index) for tile_index in range(tile_count)]
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def __getitem__(self, tile_index:int) -> TileDependencies:
+        return self.tiles[tile_index]
+
+    def __setitem__(self, tile_index:int, tile_dependencies) -> None:
+        self.clear(tile_index)
+        self.add(tile_index, tile_dependencies)
+
+    def add(self, tile_index:int, tile_dependencies) -> None:
+        '''Records that the tile depends on each of the given tiles.'''
+        forward = self.forward[tile_index]
+        for dependency in tile_dependencies:
+            if dependency in forward: continue
+            forward.add(dependency)
+            self.reverse[dependency].add(tile_index)
+
+    def clear(self, tile_index:int) -> None:
+        '''Removes all of the tile's dependencies.'''
+        for dependency in self.forward[tile_index]: self.reverse[dependency].discard(tile_index)
+        self.forward[tile_index].clear()
+
+    def get_dependent_tiles(self, tile_index:int) -> set[int]:
+        '''Returns the given tile and all tiles that depend on it, directly or not.'''
+        affected_tiles = set([tile_index])
+        queue = [tile_index]
+        while len(queue) != 0:
+            for dependent_tile in self.reverse[queue.pop()]:
+                if dependent_tile in affected_tiles: continue
+                affected_tiles.add(dependent_tile)
+                queue.append(dependent_tile)
+        return affected_tiles
+
+def get_dependent_tiles(dependencies:list[list[int]]|DependencyGraph, tile_index:int) -> set[int]:
+    '''Returns the given tile and all tiles that depend on it, directly or not.'''
+    if isinstance(dependencies, DependencyGraph): return dependencies.get_dependent_tiles(tile_index)
     affected_tiles = set([tile_index])
     while True:
         before_length = len(affected_tiles)
@@ -62,10 +163,22 @@ def strip_dependencies(dependencies:list[list[int]], tile_index:int, tiles_cache
                 if affected_tile in tile_dependencies: new_tiles.add(tile)
         affected_tiles = affected_tiles | new_tiles
         if len(affected_tiles) == before_length: break
-    for affected_tile in affected_tiles:
+    return affected_tiles
+
+def strip_dependencies(dependencies:list[list[int]]|DependencyGraph, tile_index:int, tiles_cache:list[list[int]], colors:int) -> None:
+    '''Removes tiles related to the given tile and resets their dependencies''' # TODO: remove the parameter `tiles`
+    DEFAULT = list(range(1, colors + 1))
+    for affected_tile in get_dependent_tiles(dependencies, tile_index):
         dependencies[affected_tile] = []
         tiles_cache[affected_tile] = DEFAULT[:]
         # tiles[affected_tile] = 0
+def strip_dependencies_to_board(dependencies:list[list[int]]|DependencyGraph, tile_index:int, solver_tiles:list[int], tiles:list[int], set_tile:Callable[[int,int],None]|None=None) -> None:
+    '''Sets tiles related to the given tile in `solver_tiles` back to their values in `tiles` and resets their dependencies.
+    If `set_tile` is specified, it is called with each tile index and value instead of setting `solver_tiles` directly.'''
+    for affected_tile in get_dependent_tiles(dependencies, tile_index):
+        dependencies[affected_tile] = []
+        if set_tile is None: solver_tiles[affected_tile] = tiles[affected_tile]
+        else: set_tile(affected_tile, tiles[affected_tile])
 
 def print_board(tiles:list[int]|list[list[int]]|str, size:tuple[int,int]|int) -> None:
     if isinstance(size, int): width = size
@@ -136,6 +249,64 @@ class GenerationInfo(): # for communication between threads
         self.total_clears = 0
         self.seed:int|None = None
         self.exception_holder:list[Exception]|None = None
+        self.solver_calls = 0 # times `LevelSolverBitmask.solve` was called.
+        self.solver_passes = 0 # passes of the solver's outer loop within those calls.
+        self.budget_hit = False # if breakdown stopped at its deadline before trying every tile.
+
+class TableCache(): # tables shared between generations and threads
+    '''Keeps arrays in memory by key, evicting the least recently used ones once they take up more than `budget` bytes.
+    Arrays are returned read-only, so callers that change them (such as by shuffling) have to make a copy. Arrays larger
+    than the budget are returned without being kept.'''
+    def __init__(self, budget:int) -> None:
+        self.budget = budget
+        self.tables:collections.OrderedDict[Hashable,numpy.ndarray] = collections.OrderedDict() # least recently used first.
+        self.memory_used = 0 # bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock() # held while the tables or counters are used, but not while creating a table.
+        self.key_locks:dict[Hashable,threading.Lock] = {} # held while creating the key's table, so it is only created once.
+
+    def get(self, key:Hashable, create:Callable[[],numpy.ndarray]) -> numpy.ndarray:
+        '''Returns the table with the key, calling `create` to make it if it is not kept. Other keys can be gotten while
+        it runs, and other threads wanting the same key wait for it.'''
+        with self.lock:
+            table = self.get_kept(key)
+            if table is not None: return table
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                table = self.get_kept(key) # another thread may have created it while this one waited.
+                if table is not None: return table
+                self.misses += 1
+            table = create()
+            table.flags.writeable = False
+            if table.nbytes > self.budget: return table
+            with self.lock:
+                self.tables[key] = table
+                self.memory_used += table.nbytes
+                while self.memory_used > self.budget:
+                    evicted_key, evicted_table = self.tables.popitem(last=False)
+                    self.memory_used -= evicted_table.nbytes
+                    self.evictions += 1
+            return table
+
+    def get_kept(self, key:Hashable) -> numpy.ndarray|None:
+        '''Returns the table with the key if it is kept, marking it as the most recently used. `lock` must be held.'''
+        table = self.tables.get(key)
+        if table is None: return None
+        self.hits += 1
+        self.tables.move_to_end(key)
+        return table
+
+    def clear(self) -> None:
+        with self.lock:
+            self.tables.clear()
+            self.memory_used = 0
+
+    def __repr__(self) -> str:
+        return "TableCache(tables=%i, memory_used=%i, budget=%i, hits=%i, misses=%i, evictions=%i)" %\
+            (len(self.tables), self.memory_used, self.budget, self.hits, self.misses, self.evictions)
 
 def int_to_string(number:int, base:int) -> str: # https://stackoverflow.com/questions/2267362/how-to-convert-an-integer-to-a-string-in-any-base
     return binary_repr(number) if base == 2 else base_repr(number, base)
@@ -147,14 +318,101 @@ def is_invalid_string(colors:int, max_per_row:int, regular_expression:re.Pattern
     if bool(regular_expression.search(row)): return True
     return False
 
+LINE_BLOCK_SIZE = 1 << 16 # most lines `iterate_valid_lines` extends at once.
+
+def iterate_valid_lines(size:int, colors:int, lines:numpy.ndarray|None=None, counts:numpy.ndarray|None=None, length:int|None=None) -> Iterator[numpy.ndarray]:
+    '''Yields every line of length `size` with no three in a row and at most `size // colors` of each color, as the rows
+    of arrays of colors starting at 0. They are in increasing order when read as numbers in base `colors`. Lines are built
+    a tile at a time, so a start that is already invalid is never extended, and the starts are split into blocks so the
+    memory used stays small. `lines` and `counts` ([line][color]) are the starts to extend, all of them by default. If
+    `length` is specified, the lines stop there, to be used as starts later.'''
+    if lines is None:
+        lines = numpy.zeros((1, 0), dtype=numpy.int8)
+        counts = numpy.zeros((1, colors), dtype=numpy.int8)
+    if length is None: length = size
+    if lines.shape[1] == length:
+        if len(lines) > 0: yield lines
+        return
+    if len(lines) > LINE_BLOCK_SIZE:
+        for start in range(0, len(lines), LINE_BLOCK_SIZE):
+            yield from iterate_valid_lines(size, colors, lines[start:start + LINE_BLOCK_SIZE], counts[start:start + LINE_BLOCK_SIZE], length)
+        return
+    new_colors = numpy.tile(numpy.arange(colors, dtype=numpy.int8), len(lines))
+    lines = numpy.repeat(lines, colors, axis=0)
+    counts = numpy.repeat(counts, colors, axis=0)
+    line_indexes = numpy.arange(len(lines))
+    counts[line_indexes, new_colors] += 1
+    is_valid = counts[line_indexes, new_colors] <= size // colors
+    if lines.shape[1] >= 2: is_valid &= (lines[:, -1] != new_colors) | (lines[:, -2] != new_colors)
+    yield from iterate_valid_lines(size, colors, numpy.concatenate((lines[is_valid], new_colors[is_valid, None]), axis=1), counts[is_valid], length)
+
+def get_valid_lines(size:int, colors:int) -> numpy.ndarray:
+    '''Returns all of the lines of `iterate_valid_lines` in one array.'''
+    blocks = list(iterate_valid_lines(size, colors))
+    if len(blocks) == 0: return numpy.zeros((0, size), dtype=numpy.int8)
+    return numpy.concatenate(blocks)
+
+class LineSampler(): # valid lines without listing them
+    '''Counts and uniformly samples the lines of length `size` with no three in a row and at most `size // colors` of each
+    color. If `allowed` is specified, only lines with allowed colors are counted, where `allowed[position]` has bit
+    `color` (starting at 0) set for each color allowed there. The count of ways to finish a line from each (position,
+    counts of each color, last color, how many of it end the line) is worked out once and kept.'''
+    def __init__(self, size:int, colors:int, allowed:list[int]|None=None) -> None:
+        self.size = size
+        self.colors = colors
+        self.max_per_line = size // colors
+        self.allowed = allowed if allowed is not None else [(1 << colors) - 1] * size
+        self.completions:dict[tuple[int,tuple[int,...],int,int],int] = {}
+
+    def get_next_states(self, position:int, counts:tuple[int,...], last_color:int, run_length:int) -> Iterator[tuple[int,tuple[int,...],int]]:
+        '''Yields (color, counts, run length) after each color that can be placed at the position.'''
+        for color in range(self.colors):
+            if not (self.allowed[position] >> color) & 1: continue
+            if counts[color] >= self.max_per_line: continue
+            if color == last_color and run_length >= 2: continue
+            yield color, counts[:color] + (counts[color] + 1,) + counts[color + 1:], run_length + 1 if color == last_color else 1
+
+    def count_completions(self, position:int, counts:tuple[int,...], last_color:int, run_length:int) -> int:
+        '''Returns the number of ways to finish a line from the state.'''
+        if position == self.size: return 1
+        state = (position, counts, last_color, run_length)
+        if state in self.completions: return self.completions[state]
+        total = sum(self.count_completions(position + 1, new_counts, color, new_run_length) for color, new_counts, new_run_length in self.get_next_states(*state))
+        self.completions[state] = total
+        return total
+
+    def count(self) -> int:
+        return self.count_completions(0, (0,) * self.colors, -1, 0)
+
+    def sample(self, rng:random.Random) -> list[int]|None:
+        '''Returns a line with colors starting at 0 picked uniformly at random from the allowed lines, or None if there are none.'''
+        if self.count() == 0: return None
+        line:list[int] = []
+        counts, last_color, run_length = (0,) * self.colors, -1, 0
+        for position in range(self.size):
+            index = rng.randrange(self.count_completions(position, counts, last_color, run_length))
+            for color, new_counts, new_run_length in self.get_next_states(position, counts, last_color, run_length):
+                completions = self.count_completions(position + 1, new_counts, color, new_run_length)
+                if index < completions: break
+                index -= completions
+            line.append(color)
+            counts, last_color, run_length = new_counts, color, new_run_length
+        return line
+
+valid_line_counts:dict[tuple[int,int],int] = {}
+
+def count_valid_lines(size:int, colors:int, line:list[int]|None=None) -> int:
+    '''Returns the number of valid lines of length `size`. If `line` is specified, only lines that match its known tiles
+    (0 is empty, and colors start at 1) are counted. This takes time polynomial in the size (see `LineSampler`).'''
+    if line is not None:
+        full_mask = (1 << colors) - 1
+        return LineSampler(size, colors, [full_mask if tile == 0 else 1 << (tile - 1) for tile in line]).count()
+    if (size, colors) not in valid_line_counts: valid_line_counts[size, colors] = LineSampler(size, colors).count()
+    return valid_line_counts[size, colors]
+
 def fetch_greatest_valid_size(size:int, colors:int, max_size:int|None=None) -> int:
-    regular_expression = re.compile("|".join([str(i) + "{3}" for i in range(colors)]))
-    max_per_row = int(size // colors)
-    total = 0
-    for index in range(colors ** size):
-        if not is_invalid_string(colors, max_per_row, regular_expression, int_to_string(index, colors).zfill(size)):
-            total += 1
-        if max_size is not None and total >= max_size: return max_size
+    total = count_valid_lines(size, colors)
+    if max_size is not None and total >= max_size: return max_size
     return total
 
 def get_greatest_valid_size(size:int, colors:int, max_size:int|None=None) -> int:
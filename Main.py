@@ -6,6 +6,7 @@ import UI.Colors as Colors
 import UI.Drawable as Drawable
 import UI.Textures as Textures
 import UI.UIManager as UIManager
+import Utilities.PuzzlePool as PuzzlePool
 
 
 def extend_objects(objects_input:list[Drawable.Drawable], extension:list[tuple[Drawable.Drawable,int]]) -> None:
@@ -74,5 +75,6 @@ while running:
 
 for object in objects:
     object.delete()
+PuzzlePool.stop_producer()
 
 pygame.quit()
@@ -1,15 +1,22 @@
 import json
+import multiprocessing
 import os
 import random
 import time
 from statistics import mean, median
 
 import LevelCreator.LevelCreator as LevelCreator
+import LevelCreator.LevelGenerator as LevelGenerator
 import LevelCreator.LevelSolver as LevelSolver
+import LevelCreator.LevelSolverBitmask as LevelSolverBitmask
+import LevelCreator.LevelSolverBruteForce as LevelSolverBruteForce
+import LevelCreator.LevelSpeculativeBreakdown as LevelSpeculativeBreakdown
 import LevelCreator.LevelUtilities as LU
+import LevelCreator.LevelValidator as LevelValidator
 
 REPEAT_COUNT = {2: {4: 11815, 6: 2303, 8: 629, 10: 202, 12: 82, 14: 16, 16: 2},
                 3: {3: 13971, 6: 1251, 9: 142, 12: 2}} # will take 2 minutes and 40 seconds
+TIME_TEST_SIZES = {2: [4, 6, 8, 10, 12, 14, 16], 3: [3, 6, 9, 12]}
 
 def test_a_lot() -> None:
     SIZES = [4, 6, 8, 10, 12]
@@ -43,12 +50,11 @@ def time_test(specified_colors:list[int]|None=None, usable_rules:list[bool]|None
         LU.print_board(solved, size)
         raise RuntimeError(message)
 
-    SIZES = {2: [4, 6, 8, 10, 12, 14, 16], 3: [3, 6, 9, 12]}
-    if specified_colors is None: specified_colors = list(SIZES.keys())
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
     output:dict[int,dict[str,any]] = {}
-    for color in SIZES: output[color] = {}
+    for color in TIME_TEST_SIZES: output[color] = {}
     for colors in specified_colors:
-        sizes = SIZES[colors]
+        sizes = TIME_TEST_SIZES[colors]
         for size in sizes:
             all_times_generator:list[float] = []
             all_times_solver:list[float] = []
@@ -81,6 +87,256 @@ def time_test(specified_colors:list[int]|None=None, usable_rules:list[bool]|None
     print(output)
     return output
 
+def time_test_bitmask(specified_colors:list[int]|None=None, usable_rules:list[bool]|None=None, count:int=10) -> dict[int,dict[int,dict[str,float]]]:
+    '''Solves puzzles of the `time_test` sizes with both `LevelSolver` and `LevelSolverBitmask`, checks that
+    they make the same deductions, and compares how long they take.'''
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    output:dict[int,dict[int,dict[str,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times_list:list[float] = []
+            all_times_bitmask:list[float] = []
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full, empty, other_data = LevelCreator.generate(size, seed, colors, usable_rules)
+                list_tiles = LU.expand_board(colors, empty)
+                list_dependencies:list[list[int]] = [[] for i in range(len(empty))]
+                start_time = time.perf_counter()
+                LevelSolver.solve(size, colors, list_tiles, None, list_dependencies, True, usable_rules=usable_rules)
+                all_times_list.append(time.perf_counter() - start_time)
+                bitmask_tiles = LU.expand_board_bitmask(colors, empty)
+                bitmask_dependencies:list[list[int]] = [[] for i in range(len(empty))]
+                start_time = time.perf_counter()
+                LevelSolverBitmask.solve(size, colors, bitmask_tiles, None, bitmask_dependencies, True, usable_rules=usable_rules)
+                all_times_bitmask.append(time.perf_counter() - start_time)
+                if LU.to_bitmask_board(list_tiles) != bitmask_tiles or list_dependencies != bitmask_dependencies:
+                    raise RuntimeError("The solvers disagree on seed %i (%ix%i, %i colors)!" % (seed, size, size, colors))
+            output[colors][size] = {"mean_list": mean(all_times_list), "mean_bitmask": mean(all_times_bitmask), "speedup": mean(all_times_list) / mean(all_times_bitmask)}
+    print(output)
+    return output
+
+def time_test_line_solving(specified_colors:list[int]|None=None, count:int=5) -> dict[int,dict[int,dict[str,float]]]:
+    '''Breaks down the same solutions with and without the line-solving rule, and compares time, solver passes per
+    solver call and quality.'''
+    RULES = {"without": [1, 1, 1, 1, 1], "with": [1, 1, 1, 1, 1, 1]}
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    output:dict[int,dict[int,dict[str,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times:dict[str,list[float]] = {name: [] for name in RULES}
+            all_passes:dict[str,list[float]] = {name: [] for name in RULES}
+            all_qualities:dict[str,list[int]] = {name: [] for name in RULES}
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full = LevelGenerator.generate_solution((size, size), seed, colors)
+                for name, usable_rules in RULES.items():
+                    gen_info = LU.GenerationInfo()
+                    start_time = time.perf_counter()
+                    empty = LevelCreator.breakdown(full, (size, size), seed, colors, usable_rules, gen_info)
+                    all_times[name].append(time.perf_counter() - start_time)
+                    all_passes[name].append(gen_info.solver_passes / gen_info.solver_calls)
+                    all_qualities[name].append(round(LU.count_empty_tiles(empty) / (size * size) * 100))
+            output[colors][size] = {}
+            for name in RULES:
+                output[colors][size].update({"mean_%s" % name: mean(all_times[name]), "passes_%s" % name: mean(all_passes[name]), "quality_%s" % name: mean(all_qualities[name])})
+    print(output)
+    return output
+
+def time_test_removal_orders(specified_colors:list[int]|None=None, count:int=5, orders:list[str]|None=None) -> dict[int,dict[int,dict[str,dict[str,float]]]]:
+    '''Breaks down the same solutions with each of `LevelCreator.REMOVAL_ORDERS`, and compares time, solver calls, solver
+    passes and quality per puzzle. Every order tries every tile, so the solver calls are the same, but the passes are not.'''
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    if orders is None: orders = list(LevelCreator.REMOVAL_ORDERS.keys())
+    output:dict[int,dict[int,dict[str,dict[str,float]]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times:dict[str,list[float]] = {name: [] for name in orders}
+            all_calls:dict[str,list[int]] = {name: [] for name in orders}
+            all_passes:dict[str,list[int]] = {name: [] for name in orders}
+            all_qualities:dict[str,list[int]] = {name: [] for name in orders}
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full = LevelGenerator.generate_solution((size, size), seed, colors)
+                for name in orders:
+                    gen_info = LU.GenerationInfo()
+                    start_time = time.perf_counter()
+                    empty = LevelCreator.breakdown(full, (size, size), seed, colors, gen_info=gen_info, removal_order=LevelCreator.REMOVAL_ORDERS[name])
+                    all_times[name].append(time.perf_counter() - start_time)
+                    all_calls[name].append(gen_info.solver_calls)
+                    all_passes[name].append(gen_info.solver_passes)
+                    all_qualities[name].append(round(LU.count_empty_tiles(empty) / (size * size) * 100))
+            output[colors][size] = {name: {"mean": mean(all_times[name]), "solver_calls": mean(all_calls[name]), "solver_passes": mean(all_passes[name]), "quality": mean(all_qualities[name])} for name in orders}
+    print(output)
+    return output
+
+def time_test_group_testing(specified_colors:list[int]|None=None, count:int=5) -> dict[int,dict[int,dict[str,float]]]:
+    '''Breaks down the same solutions one tile at a time and with group testing, checks that the group-tested puzzles
+    can be solved, and compares time, solver calls and quality per puzzle.'''
+    MODES = {"single": False, "group": True}
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    output:dict[int,dict[int,dict[str,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times:dict[str,list[float]] = {name: [] for name in MODES}
+            all_calls:dict[str,list[int]] = {name: [] for name in MODES}
+            all_qualities:dict[str,list[int]] = {name: [] for name in MODES}
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full = LevelGenerator.generate_solution((size, size), seed, colors)
+                for name, group_testing in MODES.items():
+                    gen_info = LU.GenerationInfo()
+                    start_time = time.perf_counter()
+                    empty = LevelCreator.breakdown(full, (size, size), seed, colors, gen_info=gen_info, group_testing=group_testing)
+                    all_times[name].append(time.perf_counter() - start_time)
+                    all_calls[name].append(gen_info.solver_calls)
+                    all_qualities[name].append(round(LU.count_empty_tiles(empty) / (size * size) * 100))
+                    solved = LU.expand_board_bitmask(colors, empty)
+                    LevelSolverBitmask.solve(size, colors, solved, error_on_failure=True)
+                    if LU.collapse_board_bitmask(solved, colors, True) != full:
+                        raise RuntimeError("The %s puzzle of seed %i (%ix%i, %i colors) solves to a different board!" % (name, seed, size, size, colors))
+            output[colors][size] = {}
+            for name in MODES:
+                output[colors][size].update({"mean_%s" % name: mean(all_times[name]), "calls_%s" % name: mean(all_calls[name]), "quality_%s" % name: mean(all_qualities[name])})
+    print(output)
+    return output
+
+def time_test_speculative(sizes:list[int]|None=None, count:int=3, workers:int|None=None) -> dict[int,dict[str,dict[str,float]]]:
+    '''Breaks down the same solutions with `LevelCreator.breakdown` and `LevelSpeculativeBreakdown.breakdown` for
+    several sets of rules, checks that they make the same puzzles, and compares how long they take. Only the default
+    rules are broken down in parallel; the rest check that the fallback makes the same puzzles.'''
+    RULES = {"default": None, "no_three_in_a_row": [0, 1, 1, 1, 1], "no_balancing": [1, 0, 1, 1, 1], "no_cloning": [1, 1, 0, 1, 1], "no_rule_4": [1, 1, 1, 0, 1]}
+    if sizes is None: sizes = [size for size in TIME_TEST_SIZES[2] if size >= 10]
+    output:dict[int,dict[str,dict[str,float]]] = {}
+    pool = multiprocessing.Pool(workers)
+    try:
+        for size in sizes:
+            all_times:dict[str,list[float]] = {name: [] for name in RULES}
+            all_times_speculative:dict[str,list[float]] = {name: [] for name in RULES}
+            for seed in range(min(count, REPEAT_COUNT[2][size])):
+                print(size, ": seed ", seed, sep="")
+                full = LevelGenerator.generate_solution((size, size), seed, 2)
+                for name, usable_rules in RULES.items():
+                    start_time = time.perf_counter()
+                    empty = LevelCreator.breakdown(full, (size, size), seed, 2, usable_rules)
+                    all_times[name].append(time.perf_counter() - start_time)
+                    start_time = time.perf_counter()
+                    empty_speculative = LevelSpeculativeBreakdown.breakdown(full, (size, size), seed, 2, usable_rules, workers=workers, pool=pool)
+                    all_times_speculative[name].append(time.perf_counter() - start_time)
+                    if empty != empty_speculative:
+                        raise RuntimeError("The breakdowns disagree on seed %i (%ix%i, %s rules)!" % (seed, size, size, name))
+            output[size] = {name: {"mean": mean(all_times[name]), "mean_speculative": mean(all_times_speculative[name]), "speedup": mean(all_times[name]) / mean(all_times_speculative[name])} for name in RULES}
+    finally:
+        pool.terminate()
+    print(output)
+    return output
+
+def time_test_dependencies(specified_colors:list[int]|None=None, count:int=10) -> dict[int,dict[int,dict[str,float]]]:
+    '''Records the dependencies found while solving puzzles of the `time_test` sizes as lists and as an
+    `LU.DependencyGraph`, checks that they give the same dependent tiles, and compares how long finding the dependent
+    tiles of every tile takes.'''
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    output:dict[int,dict[int,dict[str,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times_list:list[float] = []
+            all_times_graph:list[float] = []
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full, empty, other_data = LevelCreator.generate(size, seed, colors)
+                list_dependencies:list[list[int]] = [[] for i in range(len(empty))]
+                LevelSolverBitmask.solve(size, colors, LU.expand_board_bitmask(colors, empty), None, list_dependencies)
+                start_time = time.perf_counter()
+                graph_dependencies = LU.DependencyGraph(len(empty))
+                LevelSolverBitmask.solve(size, colors, LU.expand_board_bitmask(colors, empty), None, graph_dependencies)
+                graph_build_time = time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                list_dependent_tiles = [LU.get_dependent_tiles(list_dependencies, tile_index) for tile_index in range(len(empty))]
+                all_times_list.append(time.perf_counter() - start_time)
+                start_time = time.perf_counter()
+                graph_dependent_tiles = [LU.get_dependent_tiles(graph_dependencies, tile_index) for tile_index in range(len(empty))]
+                all_times_graph.append(time.perf_counter() - start_time + graph_build_time)
+                if list_dependent_tiles != graph_dependent_tiles:
+                    raise RuntimeError("The dependency structures disagree on seed %i (%ix%i, %i colors)!" % (seed, size, size, colors))
+            output[colors][size] = {"mean_list": mean(all_times_list), "mean_graph": mean(all_times_graph), "speedup": mean(all_times_list) / mean(all_times_graph)}
+    print(output)
+    return output
+
+def time_test_uniqueness(specified_colors:list[int]|None=None, count:int=5, extra_blanks:int=6) -> dict[int,dict[int,dict[str,float]]]:
+    '''Checks that puzzles of the `time_test` sizes have exactly one solution using `LevelSolverBruteForce`, and times
+    it, along with the same puzzles with `extra_blanks` more tiles removed.'''
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    output:dict[int,dict[int,dict[str,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            all_times:list[float] = []
+            all_times_extra:list[float] = []
+            for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                print(size, ": seed ", seed, sep="")
+                full, empty, other_data = LevelCreator.generate(size, seed, colors)
+                start_time = time.perf_counter()
+                solution_count = LevelSolverBruteForce.count_solutions(size, colors, LU.expand_board(colors, empty))
+                all_times.append(time.perf_counter() - start_time)
+                if solution_count != 1:
+                    raise RuntimeError("Seed %i (%ix%i, %i colors) has more than one solution!" % (seed, size, size, colors))
+                extra_empty = empty[:]
+                full_tiles = [tile_index for tile_index, tile in enumerate(empty) if tile != 0]
+                for tile_index in random.Random(seed).sample(full_tiles, min(extra_blanks, len(full_tiles))): extra_empty[tile_index] = 0
+                start_time = time.perf_counter()
+                LevelSolverBruteForce.count_solutions(size, colors, LU.expand_board(colors, extra_empty))
+                all_times_extra.append(time.perf_counter() - start_time)
+            output[colors][size] = {"mean": mean(all_times), "mean_extra_blanks": mean(all_times_extra)}
+    print(output)
+    return output
+
+def time_test_solution_versions(specified_colors:list[int]|None=None, count:int=5, versions:list[int]|None=None) -> dict[int,dict[int,dict[int,float]]]:
+    '''Times each version of `LevelGenerator.generate_solution` on the `time_test` sizes and checks the boards they make.
+    The legacy version is very slow past 14x14.'''
+    if specified_colors is None: specified_colors = list(TIME_TEST_SIZES.keys())
+    if versions is None: versions = [LevelGenerator.LEGACY_VERSION, LevelGenerator.BACKTRACKING_VERSION]
+    output:dict[int,dict[int,dict[int,float]]] = {}
+    for colors in specified_colors:
+        output[colors] = {}
+        for size in TIME_TEST_SIZES[colors]:
+            output[colors][size] = {}
+            for version in versions:
+                all_times:list[float] = []
+                for seed in range(min(count, REPEAT_COUNT[colors][size])):
+                    print(size, ": version ", version, ", seed ", seed, sep="")
+                    start_time = time.perf_counter()
+                    full = LevelGenerator.generate_solution((size, size), seed, colors, version=version)
+                    all_times.append(time.perf_counter() - start_time)
+                    if not LevelValidator.is_valid(LU.expand_board(colors, full), (size, size), colors):
+                        raise RuntimeError("Version %i made an invalid board on seed %i (%ix%i, %i colors)!" % (version, seed, size, size, colors))
+                output[colors][size][version] = mean(all_times)
+    print(output)
+    return output
+
+def time_test_cache() -> dict[tuple[int,int],dict[str,float]]:
+    '''Times loading each cached table of valid rows and the first solution made after it, the way the first board of a
+    size is made. Old cache files are migrated by the first load, so that is timed separately.'''
+    output:dict[tuple[int,int],dict[str,float]] = {}
+    for file_name in sorted(os.listdir("./_cache")):
+        if not (file_name.startswith("solution_") and file_name.endswith(".bin")): continue
+        width, colors = (int(number) for number in file_name[len("solution_"):-len(".bin")].split("_"))
+        print(width, ": ", colors, " colors", sep="")
+        start_time = time.perf_counter()
+        LevelGenerator.fetch_cache((width, width), colors)
+        first_load_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        LevelGenerator.fetch_cache((width, width), colors)
+        load_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        LevelGenerator.generate_solution((width, width), 0, colors)
+        output[width, colors] = {"first_load": first_load_time, "load": load_time, "first_generation": time.perf_counter() - start_time}
+    print(output)
+    return output
+
 def time_test_rectangle(specified_colors:list[int]|None=None) -> dict[int,dict[str,any]]:
     SIZES = {2: [(6, 4), (8, 6), (10, 6), (10, 8), (12, 6), (12, 8), (12, 10), (14, 8), (14, 10), (14, 12), (16, 8), (16, 10), (16, 12), (16, 14)],
              3: [(6, 3), (9, 6), (12, 6), (12, 9)]}
@@ -19,6 +19,7 @@ import UI.Tile as Tile
 import Utilities.Animation as Animation
 import Utilities.Bezier as Bezier
 import Utilities.LocalLeaderboard as LocalLeaderboard
+import Utilities.PuzzlePool as PuzzlePool
 import Utilities.Settings as Settings
 
 CLICK_ACTION_LOCKED = "locked"
@@ -28,6 +29,7 @@ BOARD_FADE_OUT_TIME_CLOSE = 0.1
 BOARD_FADE_OUT_TIME_COMPLETE = 2.0
 COMPLETION_WAIT_TIME = 0.75
 REWIND_SPEED_MAX = 0.25 # delta time between rewinding tiles.
+GENERATION_TIME_BUDGET = 5.0 # seconds breakdown of an unseeded board may take before it stops early.
 
 class ExceptionThread(threading.Thread):
     def __init__(self, group=None, target=None, name=None, args=(), kwargs=None, *, daemon=None, exception_holder:list|None=None):
@@ -78,6 +80,7 @@ class Board(Enablable.Enablable):
         self.display_size = pixel_size / largest_size
         if seed is None: self.seed = LU.get_seed()
         else:self.seed = seed
+        self.is_seeded = seed is not None # if False, a puzzle from `PuzzlePool` may be used instead.
         self.size = size
         self.colors = colors
         if usable_rules is None: usable_rules = [1, 1, 1, 2, 1]
@@ -125,9 +128,17 @@ class Board(Enablable.Enablable):
         self.full_board, self.empty_board, self.other_data, self.tiles = None, None, None, None
         # return
         self.generation_info.seed = self.seed
-        generator_return = LevelCreator.generate(self.size, self.seed, self.colors, self.usable_rules, gen_info=self.generation_info)
+        generator_return = None if self.is_seeded else PuzzlePool.pop(self.size, self.colors, self.usable_rules)
+        if generator_return is None:
+            with PuzzlePool.live_generation():
+                # seeded boards have no budget, so the seed always makes the same board.
+                time_budget = None if self.is_seeded else GENERATION_TIME_BUDGET
+                generator_return = LevelCreator.generate(self.size, self.seed, self.colors, self.usable_rules, gen_info=self.generation_info, time_budget=time_budget)
         if generator_return is None: return
         self.full_board, self.empty_board, self.other_data = generator_return
+        # a puzzle cut short by the budget is not the one its seed makes, so the seed is not kept.
+        if self.other_data.get("budget_hit", False): self.other_data["seed"] = None
+        self.seed = self.other_data["seed"]; self.generation_info.seed = self.seed
         if self.colors == 2:
             self.display_board = self.empty_board[:]
         else:
@@ -14,9 +14,9 @@ import UI.SwitchButton as SwitchButton
 import UI.Textures as Textures
 import Utilities.Animation as Animation
 import Utilities.Bezier as Bezier
+import Utilities.Levels as Levels
 import Utilities.LocalLeaderboard as LocalLeaderboard
 
-LEVELS = {2: (4, 20), 3: (3, 15), 4: (4, 12)}
 RULES_DEFAULT = [1, 1, 1, 10, 1]
 
 SWITCH = 0
@@ -250,7 +250,7 @@ class LevelSelector(Enablable.Enablable):
             [old_object.update(new_object) for old_object, new_object in zip(self.board_size_texts, self.get_board_text_object())]
             self.reload_rule_sliders()
         colors = self.display_board.colors
-        minimum, maximum = LEVELS[colors][0], LEVELS[colors][1]
+        minimum, maximum = Levels.LEVELS[colors][0], Levels.LEVELS[colors][1]
         size_list = list(range(minimum, maximum + 1, colors))
         horizontal_function = (adjust_size, [False])
         vertical_function = (adjust_size, [True])
@@ -260,7 +260,7 @@ class LevelSelector(Enablable.Enablable):
     def get_color_slider_functions(self) -> tuple[tuple[Callable,list,dict[str,Any]],int]:
         def adjust_color(index:int) -> None:
             new_color = colors_list[index]
-            self.preview_horizontal_size, self.preview_vertical_size = LEVELS[new_color][0], LEVELS[new_color][0]
+            self.preview_horizontal_size, self.preview_vertical_size = Levels.LEVELS[new_color][0], Levels.LEVELS[new_color][0]
             self.preview_colors = new_color
             self.display_board.size = (self.preview_horizontal_size, self.preview_vertical_size)
             new_position, new_size = self.get_board_positioning()
@@ -276,10 +276,10 @@ class LevelSelector(Enablable.Enablable):
             self.height_slider.set(0)
             [old_object.update(new_object) for old_object, new_object in zip(self.board_size_texts, self.get_board_text_object())]
             self.reload_rule_sliders()
-        colors_list = list(LEVELS.keys())
+        colors_list = list(Levels.LEVELS.keys())
         color_function = (adjust_color,)
         slider_length = len(colors_list)
-        # functions = [(adjust_color, [color]) for color in LEVELS]
+        # functions = [(adjust_color, [color]) for color in Levels.LEVELS]
         return color_function, slider_length
 
     def get_size_sliders(self) -> tuple[Slider.Slider,Slider.Slider]:
@@ -315,7 +315,7 @@ class LevelSelector(Enablable.Enablable):
     # def calculate_sizes(self) -> None:
     #     '''Calculates variables used for sizing stuff. Call this function if the window size changes.'''
     #     rows:list[list[tuple[int,int]]|None] = [] # list-type items are rows of (color, size); None are separators
-    #     for color, levels in LEVELS.items():
+    #     for color, levels in Levels.LEVELS.items():
     #         row:list[tuple[int,int]] = []
     #         for level in levels:
     #             row.append((color, level))
@@ -326,7 +326,7 @@ class LevelSelector(Enablable.Enablable):
     #         rows.append(None)
     #     rows.pop() # remove trailing None
 
-    #     self.total_colors = len(LEVELS)
+    #     self.total_colors = len(Levels.LEVELS)
     #     self.max_row_length = max((len(levels) for levels in rows if levels is not None))
 
     #     top_constraint = self.display_size[1] * 0.125
@@ -342,7 +342,7 @@ class LevelSelector(Enablable.Enablable):
     #     self.total_height = self.tile_size * (len(rows) - rows.count(None)) + (rows.count(None)) * self.section_padding_size
     #     self.position = (left_constraint + (horizontal_space - self.max_width) / 2, top_constraint + (vertical_space - self.total_height) / 2)
 
-    #     color_patterns:dict[int,list[int]] = dict((color, [((color - i) % color) + 1 for i in range(len(LEVELS[color]), 0, -1)] if len(LEVELS[color]) > color else list(range(color, 0, -1))[:len(LEVELS[color])]) for color in LEVELS)
+    #     color_patterns:dict[int,list[int]] = dict((color, [((color - i) % color) + 1 for i in range(len(Levels.LEVELS[color]), 0, -1)] if len(Levels.LEVELS[color]) > color else list(range(color, 0, -1))[:len(Levels.LEVELS[color])]) for color in Levels.LEVELS)
     #     self.tiles_positions:list[tuple[tuple[int,int,int,int,int],tuple[int,int]]] = [] # [(color, size), (x_position, y_position), ...]
     #     x_position, y_position = 0, 0 # pixels
     #     x, y = 0, 0 # tiles
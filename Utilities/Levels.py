@@ -0,0 +1 @@
+LEVELS = {2: (4, 20), 3: (3, 15), 4: (4, 12)} # colors: (smallest size, largest size)
@@ -0,0 +1,160 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import LevelCreator.LevelCreator as LevelCreator
+import LevelCreator.LevelUtilities as LU
+
+# An on-disk pool of pre-generated puzzles, so that boards which take a long time
+# to generate can be shown immediately. There is one file per bucket of (size,
+# colors, usable_rules), holding one JSON line per puzzle. A background producer
+# refills every bucket that falls below `LOW_WATER_MARK` up to `MAX_BUCKET_SIZE`.
+
+POOL_DIRECTORY = "./_pool"
+LOW_WATER_MARK = 2 # buckets with fewer puzzles than this are refilled.
+MAX_BUCKET_SIZE = 4
+PRODUCER_WAIT_TIME = 0.5 # seconds the producer waits between puzzles so it does not slow down the game.
+
+Bucket = tuple[tuple[int,int], int, tuple[int,...]]
+
+lock = threading.RLock() # for reading and writing bucket files.
+generation_lock = threading.Lock() # held while the producer generates, so it never generates at the same time as a board.
+wanted_buckets:set[Bucket] = set()
+producer:"PuzzleProducer|None" = None
+
+def get_bucket(size:int|tuple[int,int], colors:int, usable_rules:list[int]) -> Bucket:
+    if isinstance(size, int): size = (size, size)
+    return (size[0], size[1]), colors, tuple(int(rule) for rule in usable_rules)
+
+def get_bucket_path(bucket:Bucket) -> str:
+    (width, height), colors, usable_rules = bucket
+    return "%s/pool_%i_%i_%i_%s.jsonl" % (POOL_DIRECTORY, width, height, colors, "-".join(str(rule) for rule in usable_rules))
+
+def get_bucket_from_path(path:str) -> Bucket|None:
+    name = os.path.split(path)[1]
+    if not (name.startswith("pool_") and name.endswith(".jsonl")): return None
+    try:
+        width, height, colors, usable_rules = name[len("pool_"):-len(".jsonl")].split("_")
+        return (int(width), int(height)), int(colors), tuple(int(rule) for rule in usable_rules.split("-"))
+    except ValueError:
+        return None
+
+def read_bucket(bucket:Bucket) -> list[dict[str,any]]:
+    '''Returns the puzzles in the bucket. A line without a newline was cut off while being written, so it is skipped.'''
+    path = get_bucket_path(bucket)
+    if not os.path.exists(path): return []
+    puzzles:list[dict[str,any]] = []
+    with lock, open(path, "rt") as f:
+        for line in f:
+            if not line.endswith("\n"): continue
+            try: puzzles.append(json.loads(line))
+            except json.JSONDecodeError: continue
+    return puzzles
+
+def count(bucket:Bucket) -> int:
+    return len(read_bucket(bucket))
+
+def append(bucket:Bucket, full:list[int], empty:list[int], other_data:dict[str,any]) -> bool:
+    '''Adds a puzzle to the end of the bucket and flushes it to disk. Returns False if the bucket is full.'''
+    line = json.dumps({"full": full, "empty": empty, "other_data": other_data}) + "\n"
+    path = get_bucket_path(bucket)
+    with lock:
+        if count(bucket) >= MAX_BUCKET_SIZE: return False
+        os.makedirs(POOL_DIRECTORY, exist_ok=True)
+        with open(path, "ab") as f:
+            end = f.tell()
+            if end > 0: # cut off a line left partly written by a crash.
+                with open(path, "rb") as reader: contents = reader.read()
+                if not contents.endswith(b"\n"): f.truncate(contents.rfind(b"\n") + 1)
+            f.write(line.encode())
+            f.flush()
+            os.fsync(f.fileno())
+    return True
+
+def write_bucket(bucket:Bucket, puzzles:list[dict[str,any]]) -> None:
+    '''Replaces the bucket's file with the given puzzles. The file is replaced all at once, so a crash leaves either the old or the new contents.'''
+    path = get_bucket_path(bucket)
+    temporary_path = path + ".tmp"
+    with lock:
+        os.makedirs(POOL_DIRECTORY, exist_ok=True)
+        with open(temporary_path, "wt") as f:
+            f.writelines(json.dumps(puzzle) + "\n" for puzzle in puzzles)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+
+def pop(size:int|tuple[int,int], colors:int, usable_rules:list[int]) -> tuple[list[int],list[int],dict[str,any]]|None:
+    '''Removes and returns the oldest puzzle in the bucket in the same form as `LevelCreator.generate`, or None if it is
+    empty. Either way, the bucket is marked as wanted so the producer keeps it filled.'''
+    bucket = get_bucket(size, colors, usable_rules)
+    with lock:
+        puzzles = read_bucket(bucket)
+        if len(puzzles) > 0: write_bucket(bucket, puzzles[1:])
+    request(bucket)
+    if len(puzzles) == 0: return None
+    return puzzles[0]["full"], puzzles[0]["empty"], puzzles[0]["other_data"]
+
+def request(bucket:Bucket) -> None:
+    '''Marks the bucket as wanted, and starts the producer if it is not running.'''
+    global producer
+    with lock:
+        wanted_buckets.add(bucket)
+        if producer is None or not producer.is_alive():
+            producer = PuzzleProducer()
+            producer.start()
+    producer.wake.set()
+
+def get_bucket_to_refill() -> Bucket|None:
+    '''Returns the bucket being refilled until it is full, or else the wanted bucket with the fewest puzzles if it has
+    fewer than `LOW_WATER_MARK`.'''
+    with lock:
+        if os.path.exists(POOL_DIRECTORY): # buckets from earlier sessions are wanted, too.
+            for name in os.listdir(POOL_DIRECTORY):
+                bucket = get_bucket_from_path(name)
+                if bucket is not None: wanted_buckets.add(bucket)
+        bucket_counts = dict((bucket, count(bucket)) for bucket in wanted_buckets)
+    refilling = producer.refilling if producer is not None else None
+    if refilling in bucket_counts and bucket_counts[refilling] < MAX_BUCKET_SIZE: return refilling
+    low_buckets = [(bucket_count, bucket) for bucket, bucket_count in bucket_counts.items() if bucket_count < LOW_WATER_MARK]
+    if len(low_buckets) == 0: return None
+    return min(low_buckets)[1]
+
+@contextlib.contextmanager
+def live_generation():
+    '''Stops the producer while a board is generated outside of the pool.'''
+    if producer is not None: producer.gen_info.breaker = True
+    with generation_lock:
+        yield
+
+def stop_producer() -> None:
+    if producer is None: return
+    producer.should_stop = True
+    producer.gen_info.breaker = True
+    producer.wake.set()
+
+class PuzzleProducer(threading.Thread):
+    def __init__(self) -> None:
+        super().__init__(daemon=True)
+        self.wake = threading.Event()
+        self.should_stop = False
+        self.gen_info = LU.GenerationInfo()
+        self.refilling:Bucket|None = None # bucket being filled up to `MAX_BUCKET_SIZE`.
+
+    def run(self) -> None:
+        while not self.should_stop:
+            bucket = get_bucket_to_refill()
+            self.refilling = bucket
+            if bucket is None:
+                self.wake.wait()
+                self.wake.clear()
+                continue
+            (width, height), colors, usable_rules = bucket
+            self.gen_info = LU.GenerationInfo() # set before waiting for the lock so `live_generation` can stop it.
+            with generation_lock:
+                if self.should_stop: break
+                if self.gen_info.breaker: continue
+                generator_return = LevelCreator.generate((width, height), None, colors, list(usable_rules), self.gen_info)
+            if generator_return is not None: append(bucket, *generator_return)
+            time.sleep(PRODUCER_WAIT_TIME)